@@ -1,29 +1,52 @@
 # (Replace your existing app.py with this file)
 import os
+import atexit
+import functools
+import gzip
+import hashlib
+import heapq
 import json
-from typing import List, Dict, Any, Optional, Tuple, Set
+import logging
+import queue
+import re
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterable, Iterator
+from collections import defaultdict, deque
+from bisect import bisect_right
+from itertools import accumulate
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
-from threading import Lock
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from threading import BoundedSemaphore, Lock, Thread
 import time
+from urllib.parse import quote_plus
 
+import orjson
 import requests
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from flask import (
     Flask,
-    render_template_string,
+    render_template,
     request,
     redirect,
     url_for,
     flash,
     jsonify,
 )
-from openai import OpenAI
+from flask.json.provider import JSONProvider
+from openai import APITimeoutError, OpenAI
 
 # ---------- CONFIG FROM ENV ----------
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "replace-with-your-key")
 MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "gpt-4.1-mini")
 # Optional: set OPENAI_TEMPERATURE to a float (0.0 - 2.0). If unset, the client's default is used.
 OPENAI_TEMPERATURE = os.getenv("OPENAI_TEMPERATURE")
+# Seconds to connect and to wait between streamed chunks before giving up on OpenAI
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "20"))
+# Ask for schema-validated JSON replies; set to "false" for models without structured output support
+OPENAI_STRUCTURED_OUTPUT = os.getenv("OPENAI_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
 
 SONARR_URL = os.getenv("SONARR_URL", "http://sonarr:8989")
 SONARR_API_KEY = os.getenv("SONARR_API_KEY", "")
@@ -39,148 +62,422 @@ RADARR_ROOT_FOLDER = os.getenv("RADARR_ROOT_FOLDER", "/mnt/tank/media/Movies")
 RADARR_QUALITY_PROFILE_ID = int(os.getenv("RADARR_QUALITY_PROFILE_ID", "7"))
 
 SAMPLE_SIZE = int(os.getenv("LIBRARY_SAMPLE_SIZE", "120"))
+# Max characters of library titles per service in the prompt
+LIBRARY_CHAR_BUDGET = int(os.getenv("LIBRARY_CHAR_BUDGET", "8000"))
 ACTOR_SEARCH_LIMIT = int(os.getenv("ACTOR_SEARCH_LIMIT", "15"))
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "")
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))
+# Max concurrent lookup requests per *arr service, and concurrent TMDB requests
+ARR_LOOKUP_CONCURRENCY = int(os.getenv("ARR_LOOKUP_CONCURRENCY", "4"))
+TMDB_CONCURRENCY = int(os.getenv("TMDB_CONCURRENCY", "4"))
+# Seconds to wait for the whole batch of IMDb lookups before rendering without them
+IMDB_LOOKUP_DEADLINE = float(os.getenv("IMDB_LOOKUP_DEADLINE", "15"))
+HISTORY_MAX = int(os.getenv("HISTORY_MAX", "200"))
+# Fetch the libraries in the background at startup instead of on the first request
+WARM_CACHES_ON_START = os.getenv("WARM_CACHES_ON_START", "true").lower() in ("1", "true", "yes")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 # -------------------------------------
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Records are handed to a listener thread that writes them, so request and pool
+# threads never block on stderr
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+_log_listener = QueueListener(_log_queue, _log_output)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+# Attached directly rather than through basicConfig, which would give the handler
+# its own format on top of _log_output's
+logging.root.addHandler(QueueHandler(_log_queue))
+logging.root.setLevel(LOG_LEVEL)
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify and request.get_json."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys"):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
+# No automatic retries: the SDK's default of 2 would let a request run to 3x OPENAI_TIMEOUT
+# before the user hears about it; they can simply submit again
+client = OpenAI(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT, max_retries=0)
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "change-me")
-
-# History storage (in-memory, will reset on restart)
-history = []
+logger = app.logger
+# Static URLs carry a version (see _static_version), so browsers may cache them for a year
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000
+# Templates ship with the image and never change at runtime; don't stat them on every
+# render, even if FLASK_DEBUG is left on
+app.config["TEMPLATES_AUTO_RELOAD"] = False
+
+# Shared worker pool for outbound HTTP fan-out; threads are reused across requests
+_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+# History storage (in-memory, will reset on restart); oldest entries drop off past HISTORY_MAX
+history: "deque[Dict[str, Any]]" = deque(maxlen=HISTORY_MAX)
 _history_lock = Lock()
+# Bumped on every history change and used as the /history ETag. It starts at the
+# boot time so a restart (which may also bring new static files) never reuses one
+_history_version = time.time_ns()
 
-# Simple cache with expiry
-_library_cache = {
-    "sonarr": {"data": None, "timestamp": 0},
-    "radarr": {"data": None, "timestamp": 0},
-}
 _cache_lock = Lock()
-CACHE_TTL_SECONDS = 300  # 5 minutes
+CACHE_TTL_SECONDS = int(os.getenv("FLASK_CACHE_TTL", "300"))  # 5 minutes
+LOOKUP_CACHE_TTL_SECONDS = 3600  # *arr lookup metadata rarely changes
+TTL_CACHE_MAX_ENTRIES = 4096
+# Full library listings, and *arr lookup results keyed by service and term
+_listing_cache = TTLCache(maxsize=2, ttl=CACHE_TTL_SECONDS)
+_lookup_cache = TTLCache(maxsize=TTL_CACHE_MAX_ENTRIES, ttl=LOOKUP_CACHE_TTL_SECONDS)
+OWNED_CACHE_TTL = int(os.getenv("OWNED_CACHE_TTL", str(CACHE_TTL_SECONDS)))
+
+# Normalized titles already in the library; updated in place by successful adds
+_owned_titles: Dict[str, Any] = {
+    "tv": {}, "movie": {}, "series": None, "movies": None, "timestamp": float("-inf")
+}
+
+# Last library summary and the listing objects it was built from
+_summary_cache: Dict[str, Any] = {"series": None, "movies": None, "summary": None}
+_library_index_cache: Dict[str, Any] = {"series": None, "movies": None, "index": None}
+# System prompt and library digest derived from the last summary
+_prompt_cache: Dict[str, Any] = {"summary": None, "system": None, "digest": None}
+
+# Parsed model replies keyed by prompt hash; they also carry IMDb ratings, so they expire
+RECOMMENDATION_CACHE_SIZE = 128
+RECOMMENDATION_CACHE_TTL = int(os.getenv("RECOMMENDATION_CACHE_TTL", "600"))
+_recommendation_cache = TTLCache(maxsize=RECOMMENDATION_CACHE_SIZE, ttl=RECOMMENDATION_CACHE_TTL)
+
+# TMDB person matches and filmographies; an hour keeps new credits from going stale for long
+TMDB_CACHE_SIZE = 512
+TMDB_CACHE_TTL_SECONDS = 3600
+_tmdb_cache = TTLCache(maxsize=TMDB_CACHE_SIZE, ttl=TMDB_CACHE_TTL_SECONDS)
 
 
 # ---------- *ARR API HELPERS ----------
+def _make_session(api_key: Optional[str] = None) -> requests.Session:
+    """Create a keep-alive session, sending the *arr API key on every call if given.
+    
+    Args:
+        api_key: Sonarr/Radarr API key; None for services that authenticate otherwise
+        
+    Returns:
+        Session with a pooled adapter and light retries on connection errors
+    """
+    session = requests.Session()
+    if api_key is not None:
+        session.headers["X-Api-Key"] = api_key
+    # One pooled connection per I/O worker so a full fan-out never opens throwaway sockets
+    adapter = HTTPAdapter(pool_maxsize=IO_WORKERS, max_retries=Retry(total=2, backoff_factor=0.2))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# One pooled session per service so lookups reuse open connections
+sonarr_session = _make_session(SONARR_API_KEY)
+radarr_session = _make_session(RADARR_API_KEY)
+# TMDB takes its key as a query parameter, merged into every request's params
+tmdb_session = _make_session()
+tmdb_session.params["api_key"] = TMDB_API_KEY
+# Keeps concurrent actor searches under TMDB's rate limit
+_tmdb_slots = BoundedSemaphore(TMDB_CONCURRENCY)
+
+# POST bodies are encoded once with orjson and sent as raw bytes
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
 def sonarr_get(path: str, params: Dict[str, Any] = None):
     url = f"{SONARR_URL}/api/v3{path}"
-    headers = {"X-Api-Key": SONARR_API_KEY}
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = sonarr_session.get(url, params=params, timeout=30)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
 
 
 def radarr_get(path: str, params: Dict[str, Any] = None):
     url = f"{RADARR_URL}/api/v3{path}"
-    headers = {"X-Api-Key": RADARR_API_KEY}
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = radarr_session.get(url, params=params, timeout=30)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
 
 
-def sonarr_post(path: str, data: Dict[str, Any]):
+def sonarr_post(path: str, data: Dict[str, Any], allow_already_exists: bool = False):
     url = f"{SONARR_URL}/api/v3{path}"
-    headers = {"X-Api-Key": SONARR_API_KEY, "Content-Type": "application/json"}
-    r = requests.post(url, headers=headers, json=data, timeout=30)
+    r = sonarr_session.post(url, data=orjson.dumps(data), headers=_JSON_HEADERS, timeout=30)
+    logger.debug("[Sonarr] POST %s response status: %s", path, r.status_code)
+    if r.status_code >= 400:
+        logger.warning("[Sonarr] Error response: %s", r.text)
+        if allow_already_exists and "already exists" in r.text.lower():
+            return None
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
 
 
-def radarr_post(path: str, data: Dict[str, Any]):
+def radarr_post(path: str, data: Dict[str, Any], allow_already_exists: bool = False):
     url = f"{RADARR_URL}/api/v3{path}"
-    headers = {"X-Api-Key": RADARR_API_KEY, "Content-Type": "application/json"}
-    r = requests.post(url, headers=headers, json=data, timeout=30)
+    r = radarr_session.post(url, data=orjson.dumps(data), headers=_JSON_HEADERS, timeout=30)
+    logger.debug("[Radarr] POST %s response status: %s", path, r.status_code)
+    if r.status_code >= 400:
+        logger.warning("[Radarr] Error response: %s", r.text)
+        if allow_already_exists and "already exists" in r.text.lower():
+            return None
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
+
+
+# Last ETag and parsed body per listing URL: url -> (etag, data)
+_etag_cache: Dict[str, Tuple[str, Any]] = {}
+
+
+# The only listing fields anything reads; full rows also carry seasons, images and statistics
+LIBRARY_FIELDS = ("title", "year", "genres", "imdbId", "ratings", "overview")
+
+
+def _slim_listing(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep only LIBRARY_FIELDS of each listing row, so cached listings stay small."""
+    return [{k: item[k] for k in LIBRARY_FIELDS if k in item} for item in items]
+
+
+def _revalidating_get(session: requests.Session, url: str):
+    """GET a library listing with If-None-Match.
+    
+    When the listing is unchanged the server answers 304 with an empty body
+    and the previously parsed data is returned, skipping transfer and parse.
+    
+    Args:
+        session: Sonarr or Radarr session
+        url: Full listing URL
+        
+    Returns:
+        Listing rows trimmed to LIBRARY_FIELDS
+    """
+    last = _etag_cache.get(url)
+    headers = {"If-None-Match": last[0]} if last else None
+    r = session.get(url, headers=headers, timeout=30)
+    if r.status_code == 304 and last:
+        return last[1]
+    r.raise_for_status()
+    data = _slim_listing(orjson.loads(r.content))
+    etag = r.headers.get("ETag")
+    if etag:
+        _etag_cache[url] = (etag, data)
+    return data
+
+
+@cached(_listing_cache, key=functools.partial(hashkey, "series"), lock=_cache_lock)
+def cached_sonarr_series() -> List[Dict[str, Any]]:
+    """Full Sonarr /series listing, cached for CACHE_TTL_SECONDS and revalidated by ETag."""
+    return _revalidating_get(sonarr_session, f"{SONARR_URL}/api/v3/series")
+
+
+@cached(_listing_cache, key=functools.partial(hashkey, "movies"), lock=_cache_lock)
+def cached_radarr_movies() -> List[Dict[str, Any]]:
+    """Full Radarr /movie listing, cached for CACHE_TTL_SECONDS and revalidated by ETag."""
+    return _revalidating_get(radarr_session, f"{RADARR_URL}/api/v3/movie")
+
+
+# Only the top matches are ever used, so that's all the lookup cache keeps
+LOOKUP_RESULTS_KEPT = 10
+
+
+# Sonarr/Radarr proxy each lookup to their metadata servers and queue bursts
+# internally, so a wide fan-out only lengthens the tail; cache hits skip the wait
+_sonarr_lookup_slots = BoundedSemaphore(ARR_LOOKUP_CONCURRENCY)
+_radarr_lookup_slots = BoundedSemaphore(ARR_LOOKUP_CONCURRENCY)
+
+
+@cached(_lookup_cache, key=functools.partial(hashkey, "sonarr"), lock=_cache_lock)
+def _sonarr_lookup(term: str) -> List[Dict[str, Any]]:
+    with _sonarr_lookup_slots:
+        return sonarr_get("/series/lookup", params={"term": term})[:LOOKUP_RESULTS_KEPT]
+
+
+@cached(_lookup_cache, key=functools.partial(hashkey, "radarr"), lock=_cache_lock)
+def _radarr_lookup(term: str) -> List[Dict[str, Any]]:
+    with _radarr_lookup_slots:
+        return radarr_get("/movie/lookup", params={"term": term})[:LOOKUP_RESULTS_KEPT]
+
+
+def sonarr_lookup(term: str) -> List[Dict[str, Any]]:
+    """Sonarr /series/lookup matches, cached per case- and whitespace-insensitive term.
+    
+    The returned dicts are shared with the cache; copy before modifying.
+    """
+    return _sonarr_lookup(" ".join(term.lower().split()))
+
+
+def radarr_lookup(term: str) -> List[Dict[str, Any]]:
+    """Radarr /movie/lookup matches, cached per case- and whitespace-insensitive term.
+    
+    The returned dicts are shared with the cache; copy before modifying.
+    """
+    return _radarr_lookup(" ".join(term.lower().split()))
+
+
+def _lookup_term(title: str, year: Optional[int]) -> str:
+    """Lookup term for a title; IMDb enrichment, prefetches and adds share its cache entry."""
+    return f"{title} ({year})" if year else title
 # -------------------------------------
 
 
 # ---------- LIBRARY SAMPLING ----------
-def fetch_sonarr_sample(use_cache: bool = True) -> List[Dict[str, Any]]:
-    """Fetch Sonarr series list with optional caching.
-    
+def start_library_fetch(use_cache: bool = True) -> Tuple["Future[Any]", "Future[Any]"]:
+    """Start fetching the Sonarr series and Radarr movie listings on the shared pool.
+
+    Only plain fetches are submitted, so nothing on the pool waits on the
+    pool; collect the results with finish_library_fetch on the caller's thread.
+
     Args:
         use_cache: Whether to use cached data if available (default: True)
-        
+
+    Returns:
+        Tuple of (series_future, movies_future)
+    """
+    fetch_series = cached_sonarr_series if use_cache else (lambda: _slim_listing(sonarr_get("/series")))
+    fetch_movies = cached_radarr_movies if use_cache else (lambda: _slim_listing(radarr_get("/movie")))
+
+    # The two services are independent, so wait for max(sonarr, radarr) not the sum
+    return _executor.submit(fetch_series), _executor.submit(fetch_movies)
+
+
+def finish_library_fetch(
+    series_future: "Future[Any]", movies_future: "Future[Any]"
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], bool]:
+    """Wait for the listings started by start_library_fetch.
+
     Returns:
-        List of dictionaries containing sampled TV show metadata
+        Tuple of (series_list, movies_list, complete); a list is empty if its
+        service failed, and complete is False if either did
     """
+    complete = True
     try:
-        # Check cache
-        if use_cache:
-            with _cache_lock:
-                cached = _library_cache["sonarr"]
-                if cached["data"] is not None and (time.time() - cached["timestamp"]) < CACHE_TTL_SECONDS:
-                    series = cached["data"]
-                else:
-                    series = None
-            
-            # Fetch outside lock if cache miss
-            if series is None:
-                series = sonarr_get("/series")
-                with _cache_lock:
-                    _library_cache["sonarr"] = {"data": series, "timestamp": time.time()}
-        else:
-            series = sonarr_get("/series")
+        series = series_future.result()
     except Exception as e:
-        print("Sonarr error:", e)
-        return []
-    return [
-        {
-            "title": s.get("title"),
-            "year": s.get("year"),
-            "genres": s.get("genres"),
-            "status": s.get("status"),
-            "network": s.get("network"),
-        }
-        for s in series[:SAMPLE_SIZE]
-    ]
-
-
-def fetch_radarr_sample(use_cache: bool = True) -> List[Dict[str, Any]]:
-    """Fetch Radarr movies list with optional caching.
-    
+        logger.error("[Sonarr] Library fetch error: %s", e)
+        series = []
+        complete = False
+
+    try:
+        movies = movies_future.result()
+    except Exception as e:
+        logger.error("[Radarr] Library fetch error: %s", e)
+        movies = []
+        complete = False
+
+    return series, movies, complete
+
+
+def load_libraries(use_cache: bool = True) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], bool]:
+    """Fetch the full Sonarr series and Radarr movie listings once.
+
+    Both the prompt summary and the owned-title filter are derived from the
+    returned lists, so a recommendation request only hits /series and /movie
+    a single time. Blocks on _executor, so never call it from a pool task.
+
     Args:
         use_cache: Whether to use cached data if available (default: True)
+
+    Returns:
+        Tuple of (series_list, movies_list, complete), as from finish_library_fetch
+    """
+    return finish_library_fetch(*start_library_fetch(use_cache))
+
+
+def _library_line(item: Dict[str, Any]) -> Optional[str]:
+    """Format a library item as a compact "Title (Year)" prompt line."""
+    title = item.get("title")
+    if not title:
+        return None
+    year = item.get("year")
+    return f"{title} ({year})" if year else title
+
+
+def _stratified_sample(items: List[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+    """Pick up to size items round-robin across genres.
+    
+    The *arr APIs return titles alphabetically, so a plain slice only ever
+    shows the model the start of the alphabet. Cycling through genres spreads
+    the sample over the whole library while keeping it deterministic.
+    
+    Args:
+        items: Full Sonarr series or Radarr movie list
+        size: Maximum number of items to return
         
     Returns:
-        List of dictionaries containing sampled movie metadata
+        Sampled items, each included at most once
     """
-    try:
-        # Check cache
-        if use_cache:
-            with _cache_lock:
-                cached = _library_cache["radarr"]
-                if cached["data"] is not None and (time.time() - cached["timestamp"]) < CACHE_TTL_SECONDS:
-                    movies = cached["data"]
-                else:
-                    movies = None
-            
-            # Fetch outside lock if cache miss
-            if movies is None:
-                movies = radarr_get("/movie")
-                with _cache_lock:
-                    _library_cache["radarr"] = {"data": movies, "timestamp": time.time()}
-        else:
-            movies = radarr_get("/movie")
-    except Exception as e:
-        print("Radarr error:", e)
-        return []
-    return [
-        {
-            "title": m.get("title"),
-            "year": m.get("year"),
-            "genres": m.get("genres"),
-            "studio": m.get("studio"),
-        }
-        for m in movies[:SAMPLE_SIZE]
-    ]
-
-
-def build_library_summary() -> Dict[str, Any]:
-    return {
-        "sampled_tv_shows": fetch_sonarr_sample(),
-        "sampled_movies": fetch_radarr_sample(),
+    if len(items) <= size:
+        return items
+
+    by_genre: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for item in items:
+        for genre in item.get("genres") or ["?"]:
+            by_genre[genre].append(item)
+
+    queues = [iter(bucket) for bucket in by_genre.values()]
+    picked: List[Dict[str, Any]] = []
+    seen: Set[int] = set()
+    while queues and len(picked) < size:
+        remaining = []
+        for bucket in queues:
+            for item in bucket:
+                if id(item) not in seen:
+                    seen.add(id(item))
+                    picked.append(item)
+                    remaining.append(bucket)
+                    break
+            if len(picked) >= size:
+                break
+        queues = remaining
+    return picked
+
+
+def _fit_to_budget(lines: List[str], budget: int) -> List[str]:
+    """Keep the longest prefix of lines whose newline-joined length fits in budget."""
+    # Each line costs its length plus one separator; the last one doesn't need it
+    ends = list(accumulate(len(line) + 1 for line in lines))
+    return lines[:bisect_right(ends, budget + 1)]
+
+
+def build_library_summary(series: List[Dict[str, Any]], movies: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Build the sampled library summary sent to the model.
+
+    Each item is a single "Title (Year)" line, sampled across genres and capped
+    at SAMPLE_SIZE items and LIBRARY_CHAR_BUDGET characters per service. This
+    keeps prompt tokens (and time to first token) low without skewing towards
+    the start of the alphabet.
+
+    The cached listings are returned as the same objects until they expire or
+    change, so the last summary is reused while both are unchanged.
+
+    Args:
+        series: Full Sonarr series list
+        movies: Full Radarr movie list
+
+    Returns:
+        Dictionary with sampled TV show and movie lines
+    """
+    with _cache_lock:
+        if _summary_cache["series"] is series and _summary_cache["movies"] is movies:
+            return _summary_cache["summary"]
+
+    summary = {
+        "tv_shows": _fit_to_budget(
+            [line for line in map(_library_line, _stratified_sample(series, SAMPLE_SIZE)) if line],
+            LIBRARY_CHAR_BUDGET,
+        ),
+        "movies": _fit_to_budget(
+            [line for line in map(_library_line, _stratified_sample(movies, SAMPLE_SIZE)) if line],
+            LIBRARY_CHAR_BUDGET,
+        ),
     }
+    with _cache_lock:
+        _summary_cache.update(series=series, movies=movies, summary=summary)
+    return summary
 
 
 def extract_rating(ratings_obj: Any) -> Optional[float]:
@@ -199,17 +496,48 @@ def extract_rating(ratings_obj: Any) -> Optional[float]:
     return None
 
 
-def attach_imdb_ids(recs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+_IMDB_ID_RE = re.compile(r"tt\d{7,8}")
+
+
+def lookup_imdb(term: str, media_type: str) -> Tuple[Optional[str], Optional[float]]:
+    """Resolve a search term to an IMDb ID and rating via Sonarr or Radarr.
+    
+    Lookups are memoized per term (see sonarr_lookup/radarr_lookup), so a title
+    recommended again in a later session costs no HTTP round trip.
+    
+    Args:
+        term: Lookup term, usually "Title (Year)"
+        media_type: "tv" to search Sonarr, anything else searches Radarr
+        
+    Returns:
+        Tuple of (imdb_id, rating); both None if nothing matched
+    """
+    results = sonarr_lookup(term) if media_type == "tv" else radarr_lookup(term)
+    if not results:
+        return None, None
+    return results[0].get("imdbId"), extract_rating(results[0].get("ratings"))
+
+
+def attach_imdb_ids(recs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Attach IMDb IDs and ratings to recommendations using concurrent API calls.
     
+    Recommendations that already carry a well-formed IMDb ID (from the model,
+    or from an earlier lookup when replayed from the reply cache) skip the
+    *arr lookup; only the rest are resolved over HTTP. Each lookup is
+    submitted as soon as its rec is drawn from recs, so a generator fed by the
+    streamed completion gets lookups running while the model is still writing.
+    
     Args:
-        recs: List of recommendation dictionaries
+        recs: Recommendation dictionaries, as a list or a lazy iterable;
+            updated in place
         
     Returns:
-        List of recommendations with added 'imdb_id' and 'rating' fields
+        List of the recommendations with 'imdb_id' and 'rating' fields set
     """
     
-    def lookup_single_rec(r: Dict[str, Any]) -> Dict[str, Any]:
+    # Lookups only return their result; the recs are updated on this thread, so a
+    # lookup finishing after the deadline can't touch a rec that was already rendered
+    def lookup_single_rec(r: Dict[str, Any]) -> Tuple[Optional[str], Optional[float]]:
         """Lookup a single recommendation's IMDb ID and rating."""
         imdb_id = None
         rating = None
@@ -217,51 +545,129 @@ def attach_imdb_ids(recs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         year = r.get("year")
         media_type = r.get("type")
 
-        if not title:
-            return {**r, "imdb_id": None, "rating": None}
-
-        term = f"{title} ({year})" if year else title
+        if title:
+            term = _lookup_term(title, year)
+            try:
+                imdb_id, rating = lookup_imdb(term, media_type)
+            except Exception as e:
+                logger.warning("[attach_imdb_ids] lookup error for term %r: %s", term, e)
 
+        return imdb_id, rating
+    
+    items: List[Dict[str, Any]] = []
+    results: List[Optional[Dict[str, Any]]] = []
+    future_to_rec = {}
+    for i, rec in enumerate(recs):
+        items.append(rec)
+        results.append(None)
+        imdb_id = rec.get("imdb_id")
+        if isinstance(imdb_id, str) and _IMDB_ID_RE.fullmatch(imdb_id):
+            # Keep a rating carried over from the reply cache
+            rec.setdefault("rating", None)
+            results[i] = rec
+        else:
+            # Run lookups concurrently on the shared pool
+            future_to_rec[_executor.submit(lookup_single_rec, rec)] = i
+
+    # One deadline for the whole batch, so a slow lookup can't hold up the page
+    done, pending = wait(future_to_rec, timeout=IMDB_LOOKUP_DEADLINE)
+    for future in pending:
+        future.cancel()
+        idx = future_to_rec[future]
+        logger.warning("[attach_imdb_ids] Timeout processing recommendation at index %d", idx)
+        items[idx].update(imdb_id=None, rating=None)
+        results[idx] = items[idx]
+
+    for future in done:
+        idx = future_to_rec[future]
         try:
-            if media_type == "tv":
-                results = sonarr_get("/series/lookup", params={"term": term})
-                if results:
-                    imdb_id = results[0].get("imdbId")
-                    rating = extract_rating(results[0].get("ratings"))
-            else:
-                results = radarr_get("/movie/lookup", params={"term": term})
-                if results:
-                    imdb_id = results[0].get("imdbId")
-                    rating = extract_rating(results[0].get("ratings"))
+            imdb_id, rating = future.result()
+            items[idx].update(imdb_id=imdb_id, rating=rating)
+            results[idx] = items[idx]
         except Exception as e:
-            print("[attach_imdb_ids] lookup error for term:", term, "error:", e)
+            logger.warning("[attach_imdb_ids] Error processing recommendation: %s", e)
+            # Return original rec with None values on error
+            items[idx].update(imdb_id=None, rating=None)
+            results[idx] = items[idx]
+
+    return [add_display_fields(r) for r in results]
+
 
-        return {**r, "imdb_id": imdb_id, "rating": rating}
+def add_display_fields(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """Precompute the labels, add target and IMDb link shown for a title.
     
-    # Use ThreadPoolExecutor for concurrent lookups with per-future timeout
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_rec = {executor.submit(lookup_single_rec, rec): i for i, rec in enumerate(recs)}
-        results = [None] * len(recs)
+    Args:
+        rec: Recommendation or search result dictionary; updated in place
         
-        # Process futures as they complete with per-future timeout
-        for future in as_completed(future_to_rec):
-            idx = future_to_rec[future]
-            try:
-                # 60 second timeout per individual future
-                results[idx] = future.result(timeout=60)
-            except TimeoutError:
-                print(f"[attach_imdb_ids] Timeout processing recommendation at index {idx}")
-                results[idx] = {**recs[idx], "imdb_id": None, "rating": None}
-            except Exception as e:
-                print(f"[attach_imdb_ids] Error processing recommendation: {e}")
-                # Return original rec with None values on error
-                results[idx] = {**recs[idx], "imdb_id": None, "rating": None}
+    Returns:
+        The same dictionary with 'type_upper', 'rating_str', 'target_name'
+        and 'imdb_url' set
+    """
+    rec["type_upper"] = (rec.get("type") or "").upper()
+    rating = rec.get("rating")
+    rec["rating_str"] = f"{rating:.1f}" if rating else None
+    rec["target_name"] = "Sonarr" if rec.get("type") == "tv" else "Radarr"
+    imdb_id = rec.get("imdb_id")
+    if imdb_id:
+        rec["imdb_url"] = f"https://www.imdb.com/title/{imdb_id}/"
+    else:
+        query = f"{rec.get('title') or ''} {rec.get('year') or ''}".strip()
+        rec["imdb_url"] = f"https://www.imdb.com/find?q={quote_plus(query)}&s=tt"
+    return rec
+
+
+def _truncate(text: str, limit: int = 200) -> str:
+    """Cut text to at most limit characters, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _project(item: Dict[str, Any], kind: str) -> Dict[str, Any]:
+    """Build a search result from a Sonarr/Radarr series or movie.
     
-    return results
+    Args:
+        item: Series or movie dictionary from a lookup or library listing
+        kind: 'tv' or 'movie'
+        
+    Returns:
+        New search result dictionary with display fields set
+    """
+    return add_display_fields({
+        "title": item.get("title"),
+        "year": item.get("year"),
+        "type": kind,
+        "overview": _truncate(item.get("overview") or ""),
+        "imdb_id": item.get("imdbId"),
+        "rating": extract_rating(item.get("ratings"))
+    })
 
 
 # -------------------------------------
 
+class _TitleTranslateTable(dict):
+    """str.translate table mapping each code point to its lowercase alphanumeric form.
+
+    Entries are filled on first use, so non-ASCII titles normalize the same way
+    as ASCII ones without precomputing the whole Unicode range.
+    """
+
+    def __missing__(self, codepoint: int) -> Optional[str]:
+        kept = "".join(filter(str.isalnum, chr(codepoint).lower())) or None
+        self[codepoint] = kept
+        return kept
+
+
+_TITLE_TABLE = _TitleTranslateTable()
+# ASCII covers nearly every title, so resolve it up front rather than on first use
+for _codepoint in range(128):
+    _TITLE_TABLE.__missing__(_codepoint)
+
+# Byte tables for the pure-ASCII fast path: lowercase, then drop non-alphanumerics
+_ASCII_LOWER = bytes(range(256)).lower()
+_ASCII_DROP = bytes(c for c in range(128) if not chr(c).isalnum())
+
+
+# Library titles repeat across every owned-set rebuild, so results are memoized
+@functools.lru_cache(maxsize=8192)
 def normalize_title(title: str) -> str:
     """Normalize title for comparison by removing non-alphanumeric chars and lowercasing.
     
@@ -273,381 +679,669 @@ def normalize_title(title: str) -> str:
     """
     if not title:
         return ""
-    return "".join(filter(str.isalnum, title.lower()))
+    if title.isascii():
+        return title.encode("ascii").translate(_ASCII_LOWER, _ASCII_DROP).decode("ascii")
+    return title.translate(_TITLE_TABLE)
+
+
+# Common talk show patterns
+TALK_SHOW_PATTERNS = (
+    "tonight show", "late night", "late show", "jimmy kimmel", "jimmy fallon",
+    "conan", "daily show", "colbert", "saturday night live", "snl",
+    "live with", "show with", "graham norton", "ellen", "oprah",
+    "view", "talk show", "late late", "tonight starring"
+)
+# All patterns in one alternation, so a title is scanned once in C. Match against
+# lowercased text: re.IGNORECASE makes the alternation several times slower
+_TALK_SHOW_RE = re.compile("|".join(map(re.escape, TALK_SHOW_PATTERNS)))
 
 
+@functools.lru_cache(maxsize=4096)
 def is_talk_show(title: str) -> bool:
     """Check if a title is likely a talk show or variety show."""
-    if not title:
-        return False
+    return bool(title) and _TALK_SHOW_RE.search(title.lower()) is not None
+
+
+def get_owned_title_sets(
+    series: Optional[List[Dict[str, Any]]] = None,
+    movies: Optional[List[Dict[str, Any]]] = None,
+    complete: bool = False,
+) -> Tuple[Dict[str, Set[Optional[int]]], Dict[str, Set[Optional[int]]]]:
+    """Get owned TV shows and movies, rebuilt at most once per OWNED_CACHE_TTL.
+    
+    The sets live for the whole process and successful adds insert into them
+    directly (see mark_owned), so a just-added title is never recommended
+    while the library listings are still cached. Once the TTL passes they
+    are only rebuilt if the listings changed; an ETag revalidation that
+    comes back unchanged hands over the very same list objects.
+    
+    Args:
+        series: Sonarr series list already loaded by the caller, if any
+        movies: Radarr movie list already loaded by the caller, if any
+        complete: Whether both of the caller's listings were fetched successfully
+        
+    Returns:
+        Tuple of (owned_tv, owned_movies), each mapping a normalized title to
+        the years it is owned in; check one title and year with is_owned
+    """
+    with _cache_lock:
+        if (time.monotonic() - _owned_titles["timestamp"]) < OWNED_CACHE_TTL:
+            return _owned_titles["tv"], _owned_titles["movie"]
+
+    if series is None or movies is None:
+        series, movies, complete = load_libraries()
+    with _cache_lock:
+        if _owned_titles["series"] is series and _owned_titles["movies"] is movies:
+            _owned_titles["timestamp"] = time.monotonic()
+            return _owned_titles["tv"], _owned_titles["movie"]
+    owned_tv = _owned_years(series)
+    owned_movies = _owned_years(movies)
+
+    # Don't pin an empty set for a whole TTL when a service was unreachable;
+    # a library that really is empty still gets cached
+    if complete:
+        with _cache_lock:
+            _owned_titles.update(
+                tv=owned_tv, movie=owned_movies, series=series, movies=movies, timestamp=time.monotonic()
+            )
 
-    title_lower = title.lower()
+    return owned_tv, owned_movies
 
-    # Common talk show patterns
-    talk_show_patterns = [
-        "tonight show", "late night", "late show", "jimmy kimmel", "jimmy fallon",
-        "conan", "daily show", "colbert", "saturday night live", "snl",
-        "live with", "show with", "graham norton", "ellen", "oprah",
-        "view", "talk show", "late late", "tonight starring"
-    ]
 
-    return any(pattern in title_lower for pattern in talk_show_patterns)
+def _owned_years(items: List[Dict[str, Any]]) -> Dict[str, Set[Optional[int]]]:
+    """Map each normalized library title to the years it is owned in."""
+    owned: Dict[str, Set[Optional[int]]] = {}
+    for item in items:
+        t = normalize_title(item.get("title", ""))
+        if t:
+            owned.setdefault(t, set()).add(item.get("year"))
+    return owned
 
 
-def get_owned_title_sets() -> Tuple[Set[str], Set[str]]:
-    """Get sets of owned TV shows and movies using cached library data.
+def is_owned(owned: Dict[str, Set[Optional[int]]], title: Optional[str], year: Optional[int]) -> bool:
+    """Whether a title is in the library, matching the year too when one is known.
     
-    Returns:
-        Tuple of (owned_tv_titles, owned_movie_titles) as normalized title sets
+    Remakes and reboots share their title, so without a year only the title can be compared.
     """
-    owned_tv: Set[str] = set()
-    owned_movies: Set[str] = set()
+    years = owned.get(normalize_title(title or ""))
+    if years is None:
+        return False
+    return not year or year in years
 
-    # Reuse cached library data if available
-    try:
-        with _cache_lock:
-            cached_sonarr = _library_cache["sonarr"]
-            if cached_sonarr["data"] is not None and (time.time() - cached_sonarr["timestamp"]) < CACHE_TTL_SECONDS:
-                series = cached_sonarr["data"]
-            else:
-                series = None
-        
-        # Fetch outside lock if cache miss
-        if series is None:
-            series = sonarr_get("/series")
-            with _cache_lock:
-                _library_cache["sonarr"] = {"data": series, "timestamp": time.time()}
-        
-        for s in series:
-            t = normalize_title(s.get("title", ""))
+
+def mark_owned(media_type: str, year: Optional[int], *titles: Optional[str]) -> None:
+    """Record freshly added titles in the owned-title sets."""
+    key = "tv" if media_type == "tv" else "movie"
+    with _cache_lock:
+        for title in titles:
+            t = normalize_title(title or "")
             if t:
-                owned_tv.add(t)
-    except Exception as e:
-        print("Error fetching full Sonarr library for owned titles:", e)
+                _owned_titles[key].setdefault(t, set()).add(year)
 
-    try:
-        with _cache_lock:
-            cached_radarr = _library_cache["radarr"]
-            if cached_radarr["data"] is not None and (time.time() - cached_radarr["timestamp"]) < CACHE_TTL_SECONDS:
-                movies = cached_radarr["data"]
-            else:
-                movies = None
-        
-        # Fetch outside lock if cache miss
-        if movies is None:
-            movies = radarr_get("/movie")
-            with _cache_lock:
-                _library_cache["radarr"] = {"data": movies, "timestamp": time.time()}
+
+def get_library_index(
+    series: List[Dict[str, Any]], movies: List[Dict[str, Any]]
+) -> Dict[Tuple[str, str, Optional[int]], Dict[str, Any]]:
+    """Index library items by (type, normalized title, year) for in-process lookups.
+    
+    The year is part of the key so a remake never resolves to the original.
+    
+    Like build_library_summary, the index is rebuilt only when the cached
+    listings are replaced.
+    
+    Args:
+        series: Full Sonarr series list
+        movies: Full Radarr movie list
         
-        for m in movies:
-            t = normalize_title(m.get("title", ""))
-            if t:
-                owned_movies.add(t)
-    except Exception as e:
-        print("Error fetching full Radarr library for owned titles:", e)
+    Returns:
+        Dictionary mapping ("tv" | "movie", normalized title, year) to the library item
+    """
+    with _cache_lock:
+        if _library_index_cache["series"] is series and _library_index_cache["movies"] is movies:
+            return _library_index_cache["index"]
 
-    return owned_tv, owned_movies
+    index = {("tv", t, s.get("year")): s for s in series if (t := normalize_title(s.get("title", "")))}
+    index.update({("movie", t, m.get("year")): m for m in movies if (t := normalize_title(m.get("title", "")))})
+    with _cache_lock:
+        _library_index_cache.update(series=series, movies=movies, index=index)
+    return index
 
 
 # ---------- TMDB API HELPERS ----------
-def tmdb_search_person(name: str):
-    """Search TMDB for a person by name."""
-    if not TMDB_API_KEY:
-        print("[TMDB] No API key configured")
-        return None
-
+@cached(_tmdb_cache, key=functools.partial(hashkey, "person"), lock=_cache_lock)
+def _tmdb_search_person(name: str) -> Optional[Dict[str, Any]]:
     url = "https://api.themoviedb.org/3/search/person"
     params = {
-        "api_key": TMDB_API_KEY,
         "query": name,
         "page": 1
     }
 
-    try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        results = data.get("results", [])
-
-        if results:
-            # Return the most popular match
-            return sorted(results, key=lambda x: x.get("popularity", 0), reverse=True)[0]
+    with _tmdb_slots:
+        r = tmdb_session.get(url, params=params, timeout=10)
+    r.raise_for_status()
+    data = orjson.loads(r.content)
+    results = data.get("results", [])
+
+    if results:
+        # Return the most popular match
+        return sorted(results, key=lambda x: x.get("popularity", 0), reverse=True)[0]
+    return None
+
+
+def tmdb_search_person(name: str):
+    """Search TMDB for a person by name, cached per case- and whitespace-insensitive name."""
+    if not TMDB_API_KEY:
+        logger.warning("[TMDB] No API key configured")
         return None
+
+    try:
+        return _tmdb_search_person(" ".join(name.lower().split()))
     except Exception as e:
-        print(f"[TMDB] Person search error: {e}")
+        logger.error("[TMDB] Person search error: %s", e)
         return None
 
 
-def tmdb_get_person_credits(person_id: int, limit: int = 10):
-    """Get movies and TV shows for a person from TMDB."""
-    if not TMDB_API_KEY:
-        return []
+# Name patterns of TV credits that are appearances rather than roles
+TMDB_EXCLUDED_SHOW_PATTERNS = (
+    "tonight show", "late night", "late show", "jimmy kimmel",
+    "daily show", "show with", "live with", "graham norton",
+    "running man", "conan"
+)
+_TMDB_EXCLUDED_SHOW_RE = re.compile("|".join(map(re.escape, TMDB_EXCLUDED_SHOW_PATTERNS)))
+
+
+def _is_role_credit(credit: Dict[str, Any]) -> bool:
+    """Whether a TMDB cast credit is an actual role rather than a guest or talk-show appearance."""
+    # No character name usually means a guest appearance
+    if not credit.get("character"):
+        return False
+    if credit.get("media_type") == "tv":
+        # Filter out talk shows, news, reality by name patterns
+        if _TMDB_EXCLUDED_SHOW_RE.search(credit.get("name", "").lower()):
+            return False
+        # Only include if they have multiple episodes (not just a guest)
+        if credit.get("episode_count", 0) < 3:
+            return False
+    return True
+
+# Leading year of a TMDB date such as "1999-03-31"
+_YEAR_RE = re.compile(r"(\d{4})")
+
+
+def _parse_year(date: Optional[str]) -> Optional[int]:
+    """Extract the year from a TMDB date string, or None if it has none."""
+    match = _YEAR_RE.match(date or "")
+    return int(match.group(1)) if match else None
 
+
+@cached(_tmdb_cache, key=functools.partial(hashkey, "credits"), lock=_cache_lock)
+def _tmdb_person_credits(person_id: int, limit: int) -> List[Dict[str, Any]]:
     url = f"https://api.themoviedb.org/3/person/{person_id}/combined_credits"
-    params = {"api_key": TMDB_API_KEY}
 
-    # Talk show and news genres to exclude
-    EXCLUDE_GENRES = {"Talk", "News", "Reality", "Documentary"}
+    with _tmdb_slots:
+        r = tmdb_session.get(url, timeout=10)
+    r.raise_for_status()
+    data = orjson.loads(r.content)
 
-    try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-
-        # Get only cast credits (not crew)
-        credits = data.get("cast", [])
-
-        # Filter out talk shows, news, and guest appearances
-        filtered_credits = []
-        for credit in credits:
-            # Skip if no character name (usually means guest appearance)
-            if not credit.get("character"):
-                continue
+    # Get only cast credits (not crew)
+    credits = data.get("cast", [])
 
-            # For TV shows, check genre and episode count
-            if credit.get("media_type") == "tv":
-                # Filter out talk shows, news, reality by name patterns
-                title = credit.get("name", "").lower()
-                if any(word in title for word in ["tonight show", "late night", "late show", "jimmy kimmel",
-                                                    "daily show", "show with", "live with", "graham norton",
-                                                    "running man", "conan"]):
-                    continue
-
-                # Only include if they have multiple episodes (not just a guest)
-                episode_count = credit.get("episode_count", 0)
-                if episode_count < 3:
-                    continue
-
-            filtered_credits.append(credit)
-
-        # Sort by popularity and release date
-        filtered_credits = sorted(
-            filtered_credits,
-            key=lambda x: (x.get("popularity", 0), x.get("vote_count", 0)),
-            reverse=True
-        )
-
-        # Convert to our format
-        results = []
-        for credit in filtered_credits[:limit * 2]:  # Get more to account for filtering
-            media_type = credit.get("media_type")
-            if media_type == "movie":
-                title = credit.get("title", "")
-                year = credit.get("release_date", "")[:4] if credit.get("release_date") else None
-                results.append({
-                    "title": title,
-                    "year": int(year) if year and year.isdigit() else None,
-                    "type": "movie"
-                })
-            elif media_type == "tv":
-                title = credit.get("name", "")
-                year = credit.get("first_air_date", "")[:4] if credit.get("first_air_date") else None
-                results.append({
-                    "title": title,
-                    "year": int(year) if year and year.isdigit() else None,
-                    "type": "tv"
-                })
-
-            # Stop once we have enough results
-            if len(results) >= limit:
-                break
+    # Most popular roles first; only the top few are used, so skip sorting the rest
+    top_credits = heapq.nlargest(
+        limit * 2,  # Get more to account for filtering
+        filter(_is_role_credit, credits),
+        key=lambda x: (x.get("popularity", 0), x.get("vote_count", 0)),
+    )
+
+    # Convert to our format
+    results = []
+    # The same title shows up once per character played; only look each up once
+    seen: Set[Tuple[str, str]] = set()
+    for credit in top_credits:
+        media_type = credit.get("media_type")
+        key = (media_type, normalize_title(credit.get("title") or credit.get("name") or ""))
+        if key in seen:
+            continue
+        seen.add(key)
+        if media_type == "movie":
+            results.append({
+                "title": credit.get("title", ""),
+                "year": _parse_year(credit.get("release_date")),
+                "type": "movie",
+                "overview": _truncate(credit.get("overview") or ""),
+                "imdb_id": None,
+                "rating": credit.get("vote_average") or None
+            })
+        elif media_type == "tv":
+            results.append({
+                "title": credit.get("name", ""),
+                "year": _parse_year(credit.get("first_air_date")),
+                "type": "tv",
+                "overview": _truncate(credit.get("overview") or ""),
+                "imdb_id": None,
+                "rating": credit.get("vote_average") or None
+            })
+
+        # Stop once we have enough results
+        if len(results) >= limit:
+            break
+
+    return results
+
+
+def tmdb_get_person_credits(person_id: int, limit: int = 10):
+    """Get movies and TV shows for a person from TMDB, cached per person and limit.
 
-        return results
+    Each credit carries TMDB's overview and vote average, so results can be
+    shown without a Sonarr/Radarr lookup per title. The returned dicts are
+    shared with the cache; copy before modifying.
+    """
+    if not TMDB_API_KEY:
+        return []
+
+    try:
+        return _tmdb_person_credits(person_id, limit)
     except Exception as e:
-        print(f"[TMDB] Credits error: {e}")
+        logger.error("[TMDB] Credits error: %s", e)
         return []
 
 
 # ---------- OPENAI CALL ----------
-def get_recommendations(user_request: str, media_type: str):
-    lib_summary = build_library_summary()
-
-    system_prompt = (
-        "You are a personal media assistant for a home media server. "
-        "The user will provide a JSON summary of their EXISTING library (TV shows and movies they ALREADY OWN). "
-        "CRITICAL: Do NOT recommend ANY title that appears in the provided library summary. "
-        "Check the title carefully against the library before recommending. "
-        "Only recommend NEW titles that the user doesn't already have. "
-        "IMPORTANT: Do NOT recommend talk shows, late night shows, news programs, or variety shows. "
-        "Only recommend scripted TV series (dramas, comedies, etc.) and movies. "
-        "Avoid: Saturday Night Live, The Tonight Show, Late Night, Jimmy Kimmel, Conan, "
-        "The Daily Show, talk shows, news shows, and similar programs. "
-        "Return your answer strictly as JSON with this shape:\n"
-        '{ "recommendations": ['
-        '{ "type": "tv or movie", "title": "string", "year": 2020, "reason": "string" } ] }\n'
-        "No extra text."
-    )
+def _recommendation_cache_key(user_request: str, media_type: str, library_digest: str) -> str:
+    """Fingerprint a recommendation request for the reply cache.
+    
+    Case and whitespace in the request are ignored, so "Heist  movies" and
+    "heist movies" share an entry. The sampled library is part of the key,
+    so replies are recomputed once the library changes.
+    
+    Args:
+        user_request: Free-text request from the user
+        media_type: "tv", "movie" or "both"
+        library_digest: Digest of the sampled library, from _library_prompt
+        
+    Returns:
+        Hex digest identifying the request
+    """
+    normalized = " ".join(user_request.lower().split())
+    raw = "\x00".join((media_type, normalized, library_digest))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _get_cached_recommendations(key: str) -> Optional[List[Dict[str, Any]]]:
+    """Return copies of cached model recommendations for a prompt hash, if any."""
+    with _cache_lock:
+        recs = _recommendation_cache.get(key)
+        if recs is None:
+            return None
+    return [dict(r) for r in recs]
+
+
+def _cache_recommendations(key: str, recs: List[Dict[str, Any]]) -> None:
+    """Store model recommendations for a prompt hash for RECOMMENDATION_CACHE_TTL seconds."""
+    with _cache_lock:
+        _recommendation_cache[key] = [dict(r) for r in recs]
+
+
+# Locates the opening of the recommendations array in a partial reply
+_RECS_ARRAY_RE = re.compile(r'"recommendations"\s*:\s*\[')
+_json_decoder = json.JSONDecoder()
+
+
+def _iter_stream_text(stream) -> Iterator[str]:
+    """Yield the text deltas of a streamed chat completion."""
+    for chunk in stream:
+        if chunk.choices:
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
+
+
+def _iter_recommendations(pieces: Iterable[str], raw: List[str]) -> Iterator[Dict[str, Any]]:
+    """Yield each recommendation object as soon as it is complete in the reply.
+    
+    Objects inside the "recommendations" array are decoded one at a time with
+    JSONDecoder.raw_decode, so callers can act on early items while the model
+    is still generating later ones. Iteration stops at the array's closing
+    "]"; whatever the model writes after it is never read.
+    
+    Args:
+        pieces: Reply text as it arrives
+        raw: Receives every piece, for a full parse if nothing could be decoded
+        
+    Yields:
+        Recommendation dictionaries in reply order
+    """
+    buf = ""
+    pos = None
+    for piece in pieces:
+        raw.append(piece)
+        buf += piece
+        if pos is None:
+            match = _RECS_ARRAY_RE.search(buf)
+            if not match:
+                continue
+            pos = match.end()
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            # Wait for more text
+            if pos >= len(buf) or buf[pos] != "{":
+                break
+            try:
+                item, pos = _json_decoder.raw_decode(buf, pos)
+            except ValueError:
+                break  # object not complete yet
+            yield item
+
+
+def _stream_recommendations(req_kwargs: Dict[str, Any], received: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Run the chat completion and yield each recommendation as soon as it is complete.
+    
+    Args:
+        req_kwargs: Arguments for client.chat.completions.create
+        received: Receives every yielded recommendation, for caching the full reply
+        
+    Yields:
+        Recommendation dictionaries; none if the reply is not valid JSON
+    """
+    stream = client.chat.completions.create(**req_kwargs)
+    pieces: List[str] = []
+    try:
+        for rec in _iter_recommendations(_iter_stream_text(stream), pieces):
+            received.append(rec)
+            yield rec
+    finally:
+        # Drops the connection if the array closed before the reply ended
+        stream.close()
+    raw = "".join(pieces).strip()
+    if received or _RECS_ARRAY_RE.search(raw):
+        return
+
+    # Fall back to parsing the whole reply, tolerating a code fence or prose around the JSON
+    try:
+        try:
+            data = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Start at the first object and ignore anything after it
+            data, _ = _json_decoder.raw_decode(raw, max(raw.find("{"), 0))
+    except ValueError as e:
+        logger.error("JSON parse error: %s", e)
+        logger.debug("Raw content: %s", raw)
+        return
+
+    recs = data.get("recommendations") if isinstance(data, dict) else None
+    for rec in recs if isinstance(recs, list) else []:
+        if isinstance(rec, dict):
+            received.append(rec)
+            yield rec
+
+
+def _filter_recommendations(recs: Iterable[Dict[str, Any]], owned_future) -> Iterator[Dict[str, Any]]:
+    """Normalize each rec's type and drop repeats, talk shows and owned titles.
+    
+    Recs are passed through one at a time, so filtering keeps pace with the
+    stream. The owned-title sets are only awaited once the first rec arrives,
+    leaving them to build while the completion request is in flight.
+    
+    Args:
+        recs: Recommendations from the model or the reply cache
+        owned_future: Future resolving to (owned_tv, owned_movies)
+        
+    Yields:
+        Recommendations worth showing
+    """
+    owned: Optional[Tuple[Dict[str, Set[Optional[int]]], Dict[str, Set[Optional[int]]]]] = None
+    seen: Set[Tuple[bool, str]] = set()
+
+    for r in recs:
+        title = r.get("title", "")
+        title_norm = normalize_title(title)
+        if not title_norm:
+            continue
+
+        t = (r.get("type") or "").lower()
+        is_tv = "tv" in t or "show" in t or "series" in t
+        r["type"] = "tv" if is_tv else "movie"
+
+        # The model sometimes repeats a title; don't look it up or show it twice
+        if (is_tv, title_norm) in seen:
+            continue
+        seen.add((is_tv, title_norm))
+
+        # Check if it's a talk show
+        if is_talk_show(title):
+            logger.debug("[Filter] Skipping talk show: %s", title)
+            continue
+
+        if owned is None:
+            owned = owned_future.result()
+            logger.debug("[Filter] Owned TV shows: %d, Owned movies: %d", len(owned[0]), len(owned[1]))
+        owned_tv, owned_movies = owned
+
+        # Any owned year counts: the model's years are too loose to tell remakes apart
+        if title_norm in (owned_tv if is_tv else owned_movies):
+            kind = "TV show" if is_tv else "movie"
+            logger.debug("[Filter] Skipping %s already in library: %s", kind, title)
+            continue
+
+        yield r
+
+
+# Fixed instructions; the library block is appended per request in get_recommendations
+SYSTEM_PROMPT = (
+    "You are a personal media assistant for a home media server. "
+    "The user's EXISTING library (TV shows and movies they ALREADY OWN) is listed at the end of these instructions. "
+    "CRITICAL: Do NOT recommend ANY title that appears in the provided library summary. "
+    "Check the title carefully against the library before recommending. "
+    "Only recommend NEW titles that the user doesn't already have. "
+    "IMPORTANT: Do NOT recommend talk shows, late night shows, news programs, or variety shows. "
+    "Only recommend scripted TV series (dramas, comedies, etc.) and movies. "
+    "Avoid: Saturday Night Live, The Tonight Show, Late Night, Jimmy Kimmel, Conan, "
+    "The Daily Show, talk shows, news shows, and similar programs. "
+    "Include each title's IMDb ID (tt followed by 7 or 8 digits) when you are sure of it, "
+    "otherwise use null. "
+    "Return your answer strictly as JSON with this shape:\n"
+    '{ "recommendations": ['
+    '{ "type": "tv or movie", "title": "string", "year": 2020, "reason": "string", "imdb_id": "tt0000000 or null" } ] }\n'
+    "No extra text."
+)
 
-    type_hint = {
-        "tv": "Focus only on TV shows.",
-        "movie": "Focus only on movies.",
-        "both": "You may mix TV and movies.",
-    }.get(media_type, "You may mix TV and movies.")
-
-    user_content = (
-        "Here is a JSON summary of my current library (sampled):\n"
-        f"{json.dumps(lib_summary)[:8000]}\n\n"
-        f"My request: {user_request}\n\n"
-        f"{type_hint}"
+# Structured output schema matching the shape described in SYSTEM_PROMPT. With it
+# the reply is always bare, valid JSON, so no code fence or prose reaches the parser
+RECOMMENDATIONS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "recommendations",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "recommendations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "type": {"type": "string", "enum": ["tv", "movie"]},
+                            "title": {"type": "string"},
+                            "year": {"type": ["integer", "null"]},
+                            "reason": {"type": "string"},
+                            "imdb_id": {"type": ["string", "null"]},
+                        },
+                        "required": ["type", "title", "year", "reason", "imdb_id"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["recommendations"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+TYPE_HINTS = {
+    "tv": "Focus only on TV shows.",
+    "movie": "Focus only on movies.",
+    "both": "You may mix TV and movies.",
+}
+DEFAULT_TYPE_HINT = TYPE_HINTS["both"]
+
+
+def _library_prompt(lib_summary: Dict[str, List[str]]) -> Tuple[str, str]:
+    """Build the system prompt and library digest for a library summary.
+    
+    The instructions and library form a byte-identical prefix for a given library,
+    so OpenAI's prompt caching (prefixes of 1024+ tokens) can reuse it across
+    requests. Both values are rebuilt only when build_library_summary hands
+    back a new summary.
+    
+    Args:
+        lib_summary: Output of build_library_summary
+        
+    Returns:
+        Tuple of (system_content, library_digest)
+    """
+    with _cache_lock:
+        if _prompt_cache["summary"] is lib_summary:
+            return _prompt_cache["system"], _prompt_cache["digest"]
+
+    library = (
+        "Current library (sampled), one title per line.\n"
+        "Owned TV shows:\n"
+        + "\n".join(lib_summary["tv_shows"])
+        + "\n\nOwned movies:\n"
+        + "\n".join(lib_summary["movies"])
     )
+    system_content = SYSTEM_PROMPT + "\n\n" + library
+    digest = hashlib.sha256(library.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        _prompt_cache.update(summary=lib_summary, system=system_content, digest=digest)
+    return system_content, digest
+
+
+def get_recommendations(user_request: str, media_type: str):
+    series, movies, complete = load_libraries()
+    lib_summary = build_library_summary(series, movies)
+    system_content, library_digest = _library_prompt(lib_summary)
+
+    type_hint = TYPE_HINTS.get(media_type, DEFAULT_TYPE_HINT)
+
+    # Only the short user message varies between requests
+    user_content = f"My request: {user_request}\n\n{type_hint}"
 
     req_kwargs = {
       "model": MODEL_NAME,
       "messages": [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": system_content},
         {"role": "user", "content": user_content},
       ],
       "max_tokens": 800,
+      "stream": True,
     }
 
-    # Temperature parameter removed - not supported by all models (e.g., gpt-5-nano)
+    if OPENAI_STRUCTURED_OUTPUT:
+        req_kwargs["response_format"] = RECOMMENDATIONS_RESPONSE_FORMAT
 
-    resp = client.chat.completions.create(**req_kwargs)
+    # Temperature parameter removed - not supported by all models (e.g., gpt-5-nano)
 
-    raw = resp.choices[0].message.content.strip()
+    # Build the owned-title sets while the model is generating
+    owned_future = _executor.submit(get_owned_title_sets, series, movies, complete)
 
-    # Strip markdown code blocks if present (e.g., ```json ... ```)
-    if raw.startswith("```"):
-        # Find the first newline after opening ```
-        first_newline = raw.find("\n")
-        # Find the closing ```
-        last_backticks = raw.rfind("```")
-        if first_newline != -1 and last_backticks != -1:
-            raw = raw[first_newline + 1:last_backticks].strip()
+    # Same normalized request, media type and library summary -> reuse the earlier reply
+    cache_key = _recommendation_cache_key(user_request, media_type, library_digest)
+    cached_recs = _get_cached_recommendations(cache_key)
+    received: List[Dict[str, Any]] = []
+    if cached_recs is None:
+        source = _stream_recommendations(req_kwargs, received)
+    else:
+        logger.info("[Cache] Reusing %d cached AI recommendations", len(cached_recs))
+        source = iter(cached_recs)
 
     try:
-        data = json.loads(raw)
-        recs = data.get("recommendations", [])
-
-        recs = attach_imdb_ids(recs)
-
-        for r in recs:
-            t = (r.get("type") or "").lower()
-            if "tv" in t or "show" in t or "series" in t:
-                r["type"] = "tv"
-            else:
-                r["type"] = "movie"
+        # Recs flow from the stream through the filter into lookups as each one completes
+        recs = attach_imdb_ids(_filter_recommendations(source, owned_future))
 
-        owned_tv, owned_movies = get_owned_title_sets()
-        filtered: list[dict] = []
+        logger.info("[Filter] Got %d recommendations from AI", len(received if cached_recs is None else cached_recs))
+        logger.info("[Filter] After filtering: %d unique recommendations", len(recs))
 
-        print(f"[Filter] Got {len(recs)} recommendations from AI")
-        print(f"[Filter] Owned TV shows: {len(owned_tv)}, Owned movies: {len(owned_movies)}")
-
-        for r in recs:
-            title = r.get("title", "")
-            title_norm = normalize_title(title)
-            if not title_norm:
-                continue
-
-            # Check if it's a talk show
-            if is_talk_show(title):
-                print(f"[Filter] Skipping talk show: {title}")
-                continue
-
-            is_duplicate = False
-            if r["type"] == "tv" and title_norm in owned_tv:
-                print(f"[Filter] Skipping TV show already in library: {title}")
-                is_duplicate = True
-            if r["type"] == "movie" and title_norm in owned_movies:
-                print(f"[Filter] Skipping movie already in library: {title}")
-                is_duplicate = True
-
-            if not is_duplicate:
-                filtered.append(r)
-
-        print(f"[Filter] After filtering: {len(filtered)} unique recommendations")
-        return filtered
+        if cached_recs is None and received:
+            _cache_recommendations(cache_key, received)
+        return recs
 
+    except APITimeoutError:
+        # Not a processing bug; the caller tells the user to retry
+        raise
     except Exception as e:
-        print("JSON parse error:", e)
-        print("Raw content:", raw)
+        logger.exception("Recommendation processing error: %s", e)
         return []
 
 
 # ---------- ADD TO *ARR ----------
-def get_radarr_defaults() -> tuple[str | None, int | None]:
-    # Use environment variable values directly
-    root_path = RADARR_ROOT_FOLDER
-    profile_id = RADARR_QUALITY_PROFILE_ID
-    
-    print(f"[Radarr] Using root_path={root_path}, profile_id={profile_id}")
-    
-    return root_path, profile_id
-
-
-def get_sonarr_defaults() -> tuple[str | None, int | None, int | None]:
-    # Use environment variable values directly
-    root_path = SONARR_ROOT_FOLDER
-    quality_id = SONARR_QUALITY_PROFILE_ID
-    language_id = SONARR_LANGUAGE_PROFILE_ID
-    
-    print(f"[Sonarr] Using root_path={root_path}, quality_id={quality_id}, language_id={language_id}")
-    
-    return root_path, quality_id, language_id
+# Root folders and profiles come from the environment, so resolve them once
+RADARR_DEFAULTS: Tuple[str, int] = (RADARR_ROOT_FOLDER, RADARR_QUALITY_PROFILE_ID)
+SONARR_DEFAULTS: Tuple[str, int, int] = (
+    SONARR_ROOT_FOLDER, SONARR_QUALITY_PROFILE_ID, SONARR_LANGUAGE_PROFILE_ID
+)
+logger.info("[Radarr] Using root_path=%s, profile_id=%s", *RADARR_DEFAULTS)
+logger.info("[Sonarr] Using root_path=%s, quality_id=%s, language_id=%s", *SONARR_DEFAULTS)
 
 
-def add_movie_to_radarr(title: str, year: int | None, mode: str = "download") -> bool:
-    term = f"{title} ({year})" if year else title
+def add_movie_to_radarr(
+    title: str, year: int | None, mode: str = "download", search_ids: Optional[List[int]] = None
+) -> bool:
+    term = _lookup_term(title, year)
 
     try:
-        results = radarr_get("/movie/lookup", params={"term": term})
+        results = radarr_lookup(term)
     except Exception as e:
-        print("[Radarr] lookup error:", e)
+        logger.error("[Radarr] lookup error: %s", e)
         return False
 
     if not results:
-        print("[Radarr] No lookup results for:", term)
+        logger.info("[Radarr] No lookup results for: %s", term)
         return False
 
-    movie = results[0]
-    root_path, profile_id = get_radarr_defaults()
+    movie = dict(results[0])  # don't modify the cached lookup result
+    root_path, profile_id = RADARR_DEFAULTS
 
     movie["rootFolderPath"] = root_path
     movie["qualityProfileId"] = profile_id
     movie["monitored"] = True
 
     download = (mode == "download")
-    movie["addOptions"] = {"searchForMovie": download}
+    # Bulk adds collect the new ids instead and run one MoviesSearch afterwards
+    movie["addOptions"] = {"searchForMovie": download and search_ids is None}
 
     try:
-        url = f"{RADARR_URL}/api/v3/movie"
-        headers = {"X-Api-Key": RADARR_API_KEY, "Content-Type": "application/json"}
-        print(f"[Radarr] Adding movie to {url}")
-        print(f"[Radarr] Movie data: title={movie.get('title')}, year={movie.get('year')}")
-        r = requests.post(url, headers=headers, json=movie, timeout=30)
-        print(f"[Radarr] Response status: {r.status_code}")
-
-        if r.status_code >= 400:
-            print(f"[Radarr] Error response: {r.text}")
-            if "already exists" in r.text.lower():
-                return True
-            r.raise_for_status()
-
+        logger.info("[Radarr] Adding movie: title=%s, year=%s", movie.get("title"), movie.get("year"))
+        # An "already exists" rejection still counts as success
+        created = radarr_post("/movie", movie, allow_already_exists=True)
+        mark_owned("movie", movie.get("year") or year, title, movie.get("title"))
+        if download and search_ids is not None and created:
+            search_ids.append(created["id"])
         return True
 
     except Exception as e:
-        print(f"[Radarr] add error: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[Radarr] add error: %s: %s", type(e).__name__, e)
         return False
 
 
 def add_series_to_sonarr(title: str, year: int | None, mode: str = "download") -> bool:
-    term = f"{title} ({year})" if year else title
+    term = _lookup_term(title, year)
 
     try:
-        results = sonarr_get("/series/lookup", params={"term": term})
+        results = sonarr_lookup(term)
     except Exception as e:
-        print("[Sonarr] lookup error:", e)
+        logger.error("[Sonarr] lookup error: %s", e)
         return False
 
     if not results:
-        print("[Sonarr] No lookup results for:", term)
+        logger.info("[Sonarr] No lookup results for: %s", term)
         return False
 
-    series = results[0]
-    root_path, quality_id, language_id = get_sonarr_defaults()
+    series = dict(results[0])  # don't modify the cached lookup result
+    root_path, quality_id, language_id = SONARR_DEFAULTS
 
     series["rootFolderPath"] = root_path
     series["qualityProfileId"] = quality_id
@@ -661,489 +1355,37 @@ def add_series_to_sonarr(title: str, year: int | None, mode: str = "download") -
     }
 
     try:
-        url = f"{SONARR_URL}/api/v3/series"
-        headers = {"X-Api-Key": SONARR_API_KEY, "Content-Type": "application/json"}
-        print(f"[Sonarr] Adding series to {url}")
-        print(f"[Sonarr] Series data: title={series.get('title')}, year={series.get('year')}")
-        r = requests.post(url, headers=headers, json=series, timeout=30)
-        print(f"[Sonarr] Response status: {r.status_code}")
-
-        if r.status_code >= 400:
-            print(f"[Sonarr] Error response: {r.text}")
-            if "already exists" in r.text.lower():
-                return True
-            r.raise_for_status()
-
+        logger.info("[Sonarr] Adding series: title=%s, year=%s", series.get("title"), series.get("year"))
+        # An "already exists" rejection still counts as success
+        sonarr_post("/series", series, allow_already_exists=True)
+        mark_owned("tv", series.get("year") or year, title, series.get("title"))
         return True
 
     except Exception as e:
-        print(f"[Sonarr] add error: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[Sonarr] add error: %s: %s", type(e).__name__, e)
         return False
 
 
 # ---------- SIMPLE WEB UI ----------
-TEMPLATE = """
-<!doctype html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>Media AI Assistant</title>
-<style>
- * { box-sizing: border-box; margin: 0; padding: 0; }
- body { 
-   font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-   background: linear-gradient(135deg, #0f0c29 0%, #302b63 50%, #24243e 100%);
-   min-height: 100vh;
-   color: #e0e0e0;
-   padding: 2rem;
- }
- .container { max-width: 1200px; margin: 0 auto; }
- .header { 
-   display: flex; 
-   justify-content: space-between; 
-   align-items: center; 
-   margin-bottom: 2rem;
-   background: rgba(255, 255, 255, 0.05);
-   backdrop-filter: blur(10px);
-   padding: 1.5rem 2rem;
-   border-radius: 16px;
-   box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
- }
- h1 { 
-   font-size: 2rem; 
-   font-weight: 700;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   -webkit-background-clip: text;
-   -webkit-text-fill-color: transparent;
-   background-clip: text;
- }
- .search-section {
-   background: rgba(255, 255, 255, 0.05);
-   backdrop-filter: blur(10px);
-   padding: 2rem;
-   border-radius: 16px;
-   margin-bottom: 2rem;
-   box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
- }
- .search-section p { margin-bottom: 1rem; color: #b0b0b0; }
- textarea { 
-   width: 100%;
-   font-size: 1rem; 
-   padding: 1rem;
-   background: rgba(255, 255, 255, 0.08);
-   border: 2px solid rgba(255, 255, 255, 0.1);
-   border-radius: 12px;
-   color: #e0e0e0;
-   font-family: inherit;
-   resize: vertical;
-   transition: all 0.3s ease;
- }
- textarea:focus {
-   outline: none;
-   border-color: #667eea;
-   box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.2);
- }
- .form-controls {
-   display: flex;
-   gap: 1rem;
-   align-items: center;
-   margin-top: 1rem;
- }
- label { font-weight: 600; color: #b0b0b0; }
- select { 
-   font-size: 1rem; 
-   padding: 0.75rem 1rem;
-   background: rgba(255, 255, 255, 0.08);
-   border: 2px solid rgba(255, 255, 255, 0.1);
-   border-radius: 8px;
-   color: #e0e0e0;
-   cursor: pointer;
-   transition: all 0.3s ease;
- }
- select:focus {
-   outline: none;
-   border-color: #667eea;
- }
- button[type="submit"] {
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   color: white;
-   border: none;
-   padding: 0.75rem 2rem;
-   border-radius: 8px;
-   font-size: 1rem;
-   font-weight: 600;
-   cursor: pointer;
-   transition: all 0.3s ease;
-   box-shadow: 0 4px 15px rgba(102, 126, 234, 0.4);
- }
- button[type="submit"]:hover {
-   transform: translateY(-2px);
-   box-shadow: 0 6px 20px rgba(102, 126, 234, 0.6);
- }
- .rec { 
-   background: rgba(255, 255, 255, 0.05);
-   backdrop-filter: blur(10px);
-   border: 1px solid rgba(255, 255, 255, 0.1);
-   padding: 1.5rem;
-   margin: 1rem 0;
-   border-radius: 16px;
-   display: flex;
-   align-items: center;
-   gap: 1rem;
-   transition: all 0.3s ease;
-   box-shadow: 0 4px 16px rgba(0, 0, 0, 0.2);
- }
- .rec:hover {
-   transform: translateY(-2px);
-   box-shadow: 0 8px 24px rgba(0, 0, 0, 0.3);
-   border-color: rgba(102, 126, 234, 0.5);
- }
- .title { font-size: 1.3rem; font-weight: 700; color: #fff; }
- .type { 
-   font-size: 0.85rem; 
-   color: #667eea;
-   font-weight: 600;
-   text-transform: uppercase;
-   letter-spacing: 0.5px;
- }
- .reason { color: #b0b0b0; line-height: 1.5; margin-top: 0.5rem; }
- .flash { 
-   padding: 1rem 1.5rem;
-   margin: 1rem 0;
-   border-radius: 12px;
-   font-weight: 500;
- }
- .flash-success { 
-   background: rgba(16, 185, 129, 0.15);
-   border: 1px solid rgba(16, 185, 129, 0.3);
-   color: #10b981;
- }
- .flash-error { 
-   background: rgba(239, 68, 68, 0.15);
-   border: 1px solid rgba(239, 68, 68, 0.3);
-   color: #ef4444;
- }
- .add-btn {
-   padding: 0.6rem 1rem;
-   background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-   color: white;
-   border: none;
-   border-radius: 8px;
-   cursor: pointer;
-   font-size: 0.9rem;
-   font-weight: 600;
-   transition: all 0.3s ease;
-   white-space: nowrap;
- }
- .add-btn:hover {
-   transform: translateY(-1px);
-   box-shadow: 0 4px 12px rgba(16, 185, 129, 0.4);
- }
- .add-btn:disabled { 
-   opacity: 0.5;
-   cursor: not-allowed;
-   transform: none;
- }
- .imdb-button {
-   background: #f5c518;
-   color: #000;
-   border: none;
-   padding: 0.6rem 1rem;
-   border-radius: 8px;
-   text-decoration: none;
-   font-size: 0.9rem;
-   font-weight: 700;
-   transition: all 0.3s ease;
-   white-space: nowrap;
- }
- .imdb-button:hover { 
-   background: #f6d860;
-   transform: translateY(-1px);
-   box-shadow: 0 4px 12px rgba(245, 197, 24, 0.4);
- }
- .controls { display: flex; gap: 0.5rem; align-items: center; margin-top: 0.5rem; }
- .recs-list { list-style: none; padding: 0; margin: 0; }
- .rec-meta { display: flex; flex-direction: column; gap: 0.25rem; flex: 1; }
- .add-controls { display: flex; gap: 0.75rem; align-items: center; flex-wrap: wrap; }
- .status {
-   margin-left: 0.5rem;
-   font-weight: 600;
-   min-width: 160px;
-   font-size: 0.9rem;
- }
- .rating-badge {
-   display: inline-flex;
-   align-items: center;
-   background: #f5c518;
-   color: #000;
-   padding: 0.25rem 0.5rem;
-   border-radius: 6px;
-   font-size: 0.8rem;
-   font-weight: 700;
-   white-space: nowrap;
-   gap: 0.25rem;
- }
- .rating-badge::before {
-   content: "⭐";
- }
- .history-btn { 
-   padding: 0.75rem 1.5rem;
-   background: rgba(255, 255, 255, 0.1);
-   color: #fff;
-   border: 1px solid rgba(255, 255, 255, 0.2);
-   border-radius: 8px;
-   cursor: pointer;
-   text-decoration: none;
-   display: inline-block;
-   font-weight: 600;
-   transition: all 0.3s ease;
- }
- .history-btn:hover { 
-   background: rgba(255, 255, 255, 0.15);
-   border-color: rgba(255, 255, 255, 0.3);
-   transform: translateY(-2px);
- }
- h2 {
-   font-size: 1.5rem;
-   margin: 2rem 0 1rem 0;
-   color: #fff;
- }
-</style>
-</head>
-<body>
-  <div class="container">
-    <div class="header">
-      <h1>Steven's Media AI Assistant</h1>
-      <a href="{{ url_for('history_page') }}" class="history-btn">View History</a>
-    </div>
-    <div class="search-section">
-      <form method="POST" action="{{ url_for('index') }}">
-        <p>Ask for something, e.g. "Recommend 5 dark sci-fi shows I don't own yet".</p>
-        <textarea name="request" rows="3" placeholder="What are you in the mood for?">{{ request_text or "" }}</textarea>
-        <div class="form-controls">
-          <label>Type:</label>
-          <select name="media_type">
-            <option value="both" {% if media_type=='both' %}selected{% endif %}>TV + Movies</option>
-            <option value="tv" {% if media_type=='tv' %}selected{% endif %}>TV Only</option>
-            <option value="movie" {% if media_type=='movie' %}selected{% endif %}>Movies Only</option>
-          </select>
-          <button type="submit">Get recommendations</button>
-        </div>
-      </form>
-    </div>
-
-  {% with messages = get_flashed_messages(with_categories=true) %}
-    {% for cat, msg in messages %}
-      <div class="flash flash-{{ cat }}">{{ msg }}</div>
-    {% endfor %}
-  {% endwith %}
-
-  {% if recs %}
-    <h2>Recommendations</h2>
-    <ul id="recs" class="recs-list">
-    {% for r in recs %}
-      <li class="rec"
-	      data-title="{{ r.title }}"
-		  data-year="{{ r.year or '' }}"
-		  data-type="{{ r.type }}">
-		  
-        <div class="rec-meta" style="flex:1">
-          <div style="display: flex; align-items: center; gap: 0.5rem; flex-wrap: wrap;">
-            <div class="type">{{ r.type|upper }}{% if r.year %} · {{ r.year }}{% endif %}</div>
-            {% if r.rating %}
-              <span class="rating-badge">{{ "%.1f"|format(r.rating) }}</span>
-            {% endif %}
-          </div>
-          <div class="title">{{ r.title }}</div>
-          <div class="reason">{{ r.reason }}</div>
-        </div>
-
-        <div class="add-controls" style="display:flex; gap:0.5rem; align-items:center;">
-  
-         <button type="button" class="add-btn" data-mode="download">
-		   Add &amp; Download to {{ 'Sonarr' if r.type=='tv' else 'Radarr' }}
-		 </button>
-
-         <button type="button" class="add-btn" data-mode="library">
-		   Add to Library (no download)
-		 </button>
-
-         <span class="status" aria-live="polite" style="min-width:160px; display:inline-block; margin-left:0.5rem;"></span>
-       </div>        
-
-        {% if r.imdb_id %}
-            <a href="https://www.imdb.com/title/{{ r.imdb_id }}/" target="_blank" class="imdb-button">IMDb</a>
-        {% else %}
-            <a href="https://www.imdb.com/find?q={{ r.title }}{% if r.year %} {{ r.year }}{% endif %}&s=tt" target="_blank" class="imdb-button">IMDb</a>
-        {% endif %}
-      </li>
-    {% endfor %}
-    </ul>
-  {% endif %}
-
-  <!-- Specific Search Section -->
-  <div class="search-section" style="margin-top: 2rem;">
-    <h2 style="margin-bottom: 1rem;">Search Specific Titles</h2>
-    <form method="POST" action="{{ url_for('specific_search') }}">
-      <p>Search for a specific movie, TV show, or actor to get recommendations.</p>
-      <textarea name="search_query" rows="2" placeholder="e.g., Tom Hanks, Breaking Bad, The Matrix">{{ search_query or "" }}</textarea>
-      <div class="form-controls">
-        <label>Search Type:</label>
-        <select name="search_type">
-          <option value="title" {% if search_type=='title' %}selected{% endif %}>Movie/TV Title</option>
-          <option value="actor" {% if search_type=='actor' %}selected{% endif %}>Actor</option>
-        </select>
-        <button type="submit">Search</button>
-      </div>
-    </form>
-  </div>
-
-  {% if search_results %}
-    <h2 style="margin-top: 2rem;">Search Results</h2>
-    <ul id="search-results" class="recs-list">
-    {% for r in search_results %}
-      <li class="rec"
-          data-title="{{ r.title }}"
-          data-year="{{ r.year or '' }}"
-          data-type="{{ r.type }}">
-          
-        <div class="rec-meta" style="flex:1">
-          <div style="display: flex; align-items: center; gap: 0.5rem; flex-wrap: wrap;">
-            <div class="type">{{ r.type|upper }}{% if r.year %} · {{ r.year }}{% endif %}</div>
-            {% if r.rating %}
-              <span class="rating-badge">{{ "%.1f"|format(r.rating) }}</span>
-            {% endif %}
-          </div>
-          <div class="title">{{ r.title }}</div>
-          {% if r.overview %}
-            <div class="reason">{{ r.overview }}</div>
-          {% endif %}
-        </div>
-
-        <div class="add-controls" style="display:flex; gap:0.5rem; align-items:center;">
-  
-         <button type="button" class="add-btn" data-mode="download">
-           Add &amp; Download to {{ 'Sonarr' if r.type=='tv' else 'Radarr' }}
-         </button>
-
-         <button type="button" class="add-btn" data-mode="library">
-           Add to Library (no download)
-         </button>
-
-         <span class="status" aria-live="polite" style="min-width:160px; display:inline-block; margin-left:0.5rem;"></span>
-       </div>        
-
-        {% if r.imdb_id %}
-            <a href="https://www.imdb.com/title/{{ r.imdb_id }}/" target="_blank" class="imdb-button">IMDb</a>
-        {% else %}
-            <a href="https://www.imdb.com/find?q={{ r.title }}{% if r.year %} {{ r.year }}{% endif %}&s=tt" target="_blank" class="imdb-button">IMDb</a>
-        {% endif %}
-      </li>
-    {% endfor %}
-    </ul>
-  {% endif %}
-
-<script>
-document.addEventListener('DOMContentLoaded', () => {
-  // Submit form on Enter key in textareas (Shift+Enter for new line)
-  const textareas = document.querySelectorAll('textarea');
-  textareas.forEach(textarea => {
-    textarea.addEventListener('keydown', (e) => {
-      if (e.key === 'Enter' && !e.shiftKey) {
-        e.preventDefault();
-        e.target.form.submit();
-      }
-    });
-  });
-
-  // Helper to log to console and the UI status
-  function setStatusForItem(itemEl, text, color) {
-    const status = itemEl.querySelector('.status');
-    if (status) {
-      status.textContent = text;
-      status.style.color = color || '';
-    }
-  }
-
-  async function addItem(buttonEl) {
-    // prevent double clicks
-    if (buttonEl.disabled) return;
-
-    const item = buttonEl.closest('.rec');
-    if (!item) {
-      console.error('Cannot find parent .rec element for button', buttonEl);
-      return;
-    }
-
-    const title = item.dataset.title || '';
-    const year = item.dataset.year || '';
-    const type = item.dataset.type || 'movie';
-    const mode = buttonEl.dataset.mode || 'download';
+@functools.lru_cache(maxsize=None)
+def _static_file_version(filename: str) -> str:
+    """Version token for a static file, taken from its mtime when first requested."""
+    try:
+        return str(int(os.path.getmtime(os.path.join(app.static_folder, filename))))
+    except OSError:
+        return "0"
 
-    if (!title) {
-      setStatusForItem(item, 'Missing title', '#f88');
-      return;
-    }
 
-    // UI: disable all add buttons for this item while request runs
-    const buttons = Array.from(item.querySelectorAll('.add-btn'));
-    buttons.forEach(b => b.disabled = true);
-    setStatusForItem(item, 'Working...', '#ffd');
-
-    try {
-      const resp = await fetch("{{ url_for('add_ajax') }}", {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ title, year, type, mode })
-      });
-
-      let data = {};
-      try { data = await resp.json(); } catch(e){ /* ignore */ }
-
-      if (resp.ok) {
-        setStatusForItem(item, data.message || 'Added', '#8f8');
-        // Optionally fade the item or hide it so user can't add twice:
-        item.style.opacity = '0.6';
-      } else {
-        // server returned an error status
-        const msg = data && data.message ? data.message : (`Server error: ${resp.status}`);
-        setStatusForItem(item, msg, '#f88');
-      }
-    } catch (err) {
-      console.error('Network error calling add_ajax', err);
-      setStatusForItem(item, 'Network error', '#f88');
-    } finally {
-      // re-enable buttons so user can retry
-      buttons.forEach(b => b.disabled = false);
-    }
-  }
-
-  // Attach click listeners to buttons via event delegation (handles dynamically-added items)
-  document.body.addEventListener('click', (ev) => {
-    const btn = ev.target.closest && ev.target.closest('.add-btn');
-    if (!btn) return;
-    // stop default and handle via AJAX
-    ev.preventDefault();
-    addItem(btn);
-  });
-
-  // Optional: helper to clear status for all items (not necessary)
-  // document.getElementById('clear-statuses')?.addEventListener('click', () => {
-  //   document.querySelectorAll('.rec .status').forEach(s => s.textContent = '');
-  // });
-});
-</script>
-
-  </div>
-</body>
-</html>
-"""
+@app.url_defaults
+def _static_version(endpoint: str, values: Dict[str, Any]) -> None:
+    """Append ?v=<version> to static URLs so a changed file gets a new URL."""
+    if endpoint == "static" and "filename" in values:
+        values.setdefault("v", _static_file_version(values["filename"]))
 
 
 @app.route("/", methods=["GET", "POST"])
 def index():
+    global _history_version
     recs = []
     request_text = ""
     media_type = "both"
@@ -1155,21 +1397,27 @@ def index():
         if not request_text:
             flash("Please type what you're in the mood for.", "error")
         else:
-            recs = get_recommendations(request_text, media_type)
-            if not recs:
-                flash("No recommendations returned. Check logs.", "error")
+            try:
+                recs = get_recommendations(request_text, media_type)
+            except APITimeoutError as e:
+                logger.warning("[index] OpenAI timed out: %s", e)
+                flash("The AI took too long to respond. Please try again.", "error")
             else:
-                # Save to history (thread-safe)
-                with _history_lock:
-                    history.insert(0, {
-                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "request": request_text,
-                        "media_type": media_type,
-                        "recommendations": recs
-                    })
-
-    return render_template_string(
-        TEMPLATE,
+                if not recs:
+                    flash("No recommendations returned. Check logs.", "error")
+                else:
+                    # Save to history (thread-safe)
+                    with _history_lock:
+                        history.appendleft({
+                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                            "request": request_text,
+                            "media_type": media_type,
+                            "recommendations": recs
+                        })
+                        _history_version += 1
+
+    return render_template(
+        "index.html",
         recs=recs,
         request_text=request_text,
         media_type=media_type,
@@ -1189,37 +1437,34 @@ def specific_search():
         flash("Please enter a search query.", "error")
     else:
         try:
+            # Fetch (or reuse) the library listings while Sonarr/Radarr or TMDB are queried
+            library_futures = start_library_fetch()
+
             if search_type == "title":
-                # Concurrent API calls for title search
-                with ThreadPoolExecutor(max_workers=2) as executor:
-                    sonarr_future = executor.submit(sonarr_get, "/series/lookup", {"term": search_query})
-                    radarr_future = executor.submit(radarr_get, "/movie/lookup", {"term": search_query})
-                    
+                # Concurrent API calls for title search on the shared pool
+                sonarr_future = _executor.submit(sonarr_lookup, search_query)
+                radarr_future = _executor.submit(radarr_lookup, search_query)
+
+                # One service being down shouldn't hide the other's results
+                try:
                     sonarr_results = sonarr_future.result()
+                except Exception as e:
+                    logger.error("[specific_search] Sonarr lookup error: %s", e)
+                    sonarr_results = []
+                try:
                     radarr_results = radarr_future.result()
+                except Exception as e:
+                    logger.error("[specific_search] Radarr lookup error: %s", e)
+                    radarr_results = []
 
                 for item in sonarr_results[:10]:
-                    search_results.append({
-                        "title": item.get("title"),
-                        "year": item.get("year"),
-                        "type": "tv",
-                        "overview": item.get("overview", "")[:200] + "..." if item.get("overview") else "",
-                        "imdb_id": item.get("imdbId"),
-                        "rating": extract_rating(item.get("ratings"))
-                    })
+                    search_results.append(_project(item, "tv"))
 
                 for item in radarr_results[:10]:
-                    search_results.append({
-                        "title": item.get("title"),
-                        "year": item.get("year"),
-                        "type": "movie",
-                        "overview": item.get("overview", "")[:200] + "..." if item.get("overview") else "",
-                        "imdb_id": item.get("imdbId"),
-                        "rating": extract_rating(item.get("ratings"))
-                    })
+                    search_results.append(_project(item, "movie"))
 
             elif search_type == "actor":
-                print(f"[specific_search] Searching for actor via TMDB: {search_query}")
+                logger.info("[specific_search] Searching for actor via TMDB: %s", search_query)
 
                 # Use TMDB to find the actor
                 person = tmdb_search_person(search_query)
@@ -1229,75 +1474,39 @@ def specific_search():
                 else:
                     person_name = person.get("name")
                     person_id = person.get("id")
-                    print(f"[specific_search] Found person: {person_name} (ID: {person_id})")
+                    logger.info("[specific_search] Found person: %s (ID: %s)", person_name, person_id)
 
                     # Get their filmography from TMDB
                     tmdb_credits = tmdb_get_person_credits(person_id, limit=ACTOR_SEARCH_LIMIT)
-                    print(f"[specific_search] Found {len(tmdb_credits)} credits from TMDB")
-
-                    # Look up each title in Sonarr/Radarr concurrently
-                    def lookup_credit(credit):
-                        """Lookup a single credit in Sonarr/Radarr."""
-                        title = credit.get("title")
-                        media_type = credit.get("type")
-
-                        if not title:
-                            return None
-
-                        try:
-                            if media_type == "tv":
-                                results = sonarr_get("/series/lookup", params={"term": title})
-                                if results:
-                                    item = results[0]
-                                    return {
-                                        "title": item.get("title"),
-                                        "year": item.get("year"),
-                                        "type": "tv",
-                                        "overview": item.get("overview", "")[:200] + "..." if item.get("overview") else "",
-                                        "imdb_id": item.get("imdbId"),
-                                        "rating": extract_rating(item.get("ratings"))
-                                    }
-                            elif media_type == "movie":
-                                results = radarr_get("/movie/lookup", params={"term": title})
-                                if results:
-                                    item = results[0]
-                                    return {
-                                        "title": item.get("title"),
-                                        "year": item.get("year"),
-                                        "type": "movie",
-                                        "overview": item.get("overview", "")[:200] + "..." if item.get("overview") else "",
-                                        "imdb_id": item.get("imdbId"),
-                                        "rating": extract_rating(item.get("ratings"))
-                                    }
-                        except Exception as lookup_error:
-                            print(f"[specific_search] Error looking up '{title}': {lookup_error}")
-                        
-                        return None
-
-                    # Use ThreadPoolExecutor for concurrent lookups with per-future timeout
-                    with ThreadPoolExecutor(max_workers=5) as executor:
-                        futures = [executor.submit(lookup_credit, credit) for credit in tmdb_credits]
-                        
-                        # Process futures as they complete with per-future timeout
-                        for future in as_completed(futures):
-                            try:
-                                # 60 second timeout per individual future
-                                result = future.result(timeout=60)
-                                if result:
-                                    search_results.append(result)
-                            except TimeoutError:
-                                print(f"[specific_search] Timeout processing credit")
-                            except Exception as e:
-                                print(f"[specific_search] Error processing credit: {e}")
+                    logger.info("[specific_search] Found %d credits from TMDB", len(tmdb_credits))
+
+                    series, movies, _ = finish_library_fetch(*library_futures)
+                    library_index = get_library_index(series, movies)
+
+                    # Owned titles show the library's IMDb details; everything else uses
+                    # TMDB's data as-is. Sonarr/Radarr are only asked once the user clicks Add.
+                    for credit in tmdb_credits:
+                        item = library_index.get((credit["type"], normalize_title(credit["title"]), credit["year"]))
+                        if item is not None:
+                            search_results.append(_project(item, credit["type"]))
+                        else:
+                            search_results.append(add_display_fields(dict(credit)))
 
                     flash(f"Found {len(search_results)} titles featuring {person_name}", "success")
 
+            # Owned titles get no Add buttons, saving a doomed Sonarr/Radarr round trip
+            if search_results:
+                owned_tv, owned_movies = get_owned_title_sets(*finish_library_fetch(*library_futures))
+                for r in search_results:
+                    owned = owned_tv if r["type"] == "tv" else owned_movies
+                    r["owned"] = is_owned(owned, r.get("title"), r.get("year"))
+
         except Exception as e:
-            print(f"[specific_search] Error: {e}")
+            logger.exception("[specific_search] Error: %s", e)
             flash("Error searching. Check logs.", "error")
 
-    return render_template_string(
-        TEMPLATE,
+    return render_template(
+        "index.html",
         recs=[],
         request_text="",
         media_type="both",
@@ -1307,25 +1516,128 @@ def specific_search():
     )
 
 
-@app.route("/add", methods=["POST"])
-def add():
-    # legacy endpoint used for non-JS fallback (keeps redirect/flash behavior)
-    title = request.form.get("title")
-    year_raw = request.form.get("year") or ""
-    media_type = request.form.get("type")
-    mode = request.form.get("mode", "download")
+# Text responses worth compressing; below GZIP_MIN_SIZE gzip's header overhead outweighs the savings
+COMPRESS_MIMETYPES = {"text/html", "application/json", "text/css", "text/javascript", "application/javascript"}
+GZIP_MIN_SIZE = 500
+
+
+@functools.lru_cache(maxsize=64)
+def _gzipped_static_file(path: str, mtime: float) -> bytes:
+    """Gzipped contents of a static file; the mtime in the key drops stale entries on edit."""
+    with open(path, "rb") as f:
+        return gzip.compress(f.read(), compresslevel=6)
+
+
+@app.after_request
+def _gzip_response(response):
+    """Gzip pages, JSON and static CSS/JS for clients that accept it."""
+    if (
+        response.mimetype not in COMPRESS_MIMETYPES
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or "gzip" not in request.headers.get("Accept-Encoding", "")
+    ):
+        return response
+    if response.direct_passthrough:
+        # Static files are sent straight from disk; serve their cached compressed copy instead
+        if (response.content_length or 0) < GZIP_MIN_SIZE:
+            return response
+        path = os.path.join(app.static_folder, request.view_args["filename"])
+        data = _gzipped_static_file(path, os.path.getmtime(path))
+        response.response.close()
+        response.direct_passthrough = False
+        response.set_data(data)
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+        # The compressed bytes never change for a given file, so they keep a strong ETag of their own
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f"{etag}-gzip")
+            response.make_conditional(request)
+        return response
+    if response.is_streamed:
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    # The bytes differ from the file's, but revalidation against the same ETag still holds
+    etag, _ = response.get_etag()
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@app.after_request
+def _no_store_add_responses(response):
+    """Keep add results out of browser and proxy caches."""
+    if request.endpoint in ("add_ajax", "add_bulk"):
+        response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def _do_add(
+    title: str, year_raw: Any, media_type: str, mode: str, search_ids: Optional[List[int]] = None
+) -> Tuple[bool, str]:
+    """Parse the year and hand the title to Sonarr or Radarr.
+    
+    Args:
+        title: Title to add
+        year_raw: Year as submitted (string, int or empty)
+        media_type: "tv" adds to Sonarr, anything else to Radarr
+        mode: "download" to search right away, otherwise library only
+        search_ids: Passed through to add_movie_to_radarr for bulk adds
+        
+    Returns:
+        Tuple of (ok, target service name)
+    """
+    year = _form_year(year_raw)
+    if media_type == "tv":
+        return add_series_to_sonarr(title, year, mode), "Sonarr"
+    return add_movie_to_radarr(title, year, mode, search_ids=search_ids), "Radarr"
 
+
+def _form_year(year_raw: Any) -> Optional[int]:
+    """Year as submitted (string, int or empty), or None if it isn't a number."""
     try:
-        year = int(year_raw) if year_raw else None
-    except ValueError:
-        year = None
+        return int(year_raw) if year_raw else None
+    except (ValueError, TypeError):
+        return None
+
 
+def _prefetch_add(title: str, year_raw: Any, media_type: str) -> Tuple[bool, str]:
+    """Run the lookup an add would start with, so the add itself hits the lookup cache.
+    
+    Args:
+        title: Title about to be added
+        year_raw: Year as submitted (string, int or empty)
+        media_type: "tv" looks up in Sonarr, anything else in Radarr
+        
+    Returns:
+        Tuple of (found, target service name)
+    """
+    term = _lookup_term(title, _form_year(year_raw))
     if media_type == "tv":
-        ok = add_series_to_sonarr(title, year, mode)
-        target = "Sonarr"
+        lookup, target = sonarr_lookup, "Sonarr"
     else:
-        ok = add_movie_to_radarr(title, year, mode)
-        target = "Radarr"
+        lookup, target = radarr_lookup, "Radarr"
+    try:
+        return bool(lookup(term)), target
+    except Exception as e:
+        logger.warning("[%s] Prefetch lookup error: %s", target, e)
+        return False, target
+
+
+@app.route("/add", methods=["POST"])
+def add():
+    # legacy endpoint used for non-JS fallback (keeps redirect/flash behavior)
+    title = request.form.get("title")
+    mode = request.form.get("mode", "download")
+    ok, target = _do_add(title, request.form.get("year"), request.form.get("type"), mode)
 
     action_desc = "with download" if mode == "download" else "library only"
 
@@ -1347,22 +1659,19 @@ def add_ajax():
         media_type = data.get("type") or "movie"
         mode = data.get("mode") or "download"
 
-        print(f"[add_ajax] Request data: title={title}, year={year_raw}, type={media_type}, mode={mode}")
-
-        try:
-            year = int(year_raw) if year_raw else None
-        except (ValueError, TypeError):
-            year = None
+        logger.debug("[add_ajax] Request data: title=%s, year=%s, type=%s, mode=%s", title, year_raw, media_type, mode)
 
         if not title:
             return jsonify({"status": "error", "message": "Missing title"}), 400
 
-        if media_type == "tv":
-            ok = add_series_to_sonarr(title, year, mode)
-            target = "Sonarr"
-        else:
-            ok = add_movie_to_radarr(title, year, mode)
-            target = "Radarr"
+        # Sent on hover: look the title up now so the click that follows skips the wait
+        if mode == "validate":
+            found, target = _prefetch_add(title, year_raw, media_type)
+            if found:
+                return "", 204
+            return jsonify({"status": "error", "message": f"'{title}' not found in {target}"}), 404
+
+        ok, target = _do_add(title, year_raw, media_type, mode)
 
         action_desc = ("with download" if mode == "download" else "no download (library only)")
 
@@ -1372,372 +1681,91 @@ def add_ajax():
             return jsonify({"status": "error", "message": f"Failed to add '{title}'. Check server logs."}), 500
     
     except Exception as e:
-        print(f"[add_ajax] Unhandled exception: {type(e).__name__}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[add_ajax] Unhandled exception: %s: %s", type(e).__name__, e)
         return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
 
 
-HISTORY_TEMPLATE = """
-<!doctype html>
-<html>
-<head>
-<meta charset="utf-8">
-<title>Search History - Media AI Assistant</title>
-<style>
- * { box-sizing: border-box; margin: 0; padding: 0; }
- body { 
-   font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-   background: linear-gradient(135deg, #0f0c29 0%, #302b63 50%, #24243e 100%);
-   min-height: 100vh;
-   color: #e0e0e0;
-   padding: 2rem;
- }
- .container { max-width: 1200px; margin: 0 auto; }
- .header { 
-   display: flex;
-   justify-content: space-between;
-   align-items: center;
-   margin-bottom: 2rem;
-   background: rgba(255, 255, 255, 0.05);
-   backdrop-filter: blur(10px);
-   padding: 1.5rem 2rem;
-   border-radius: 16px;
-   box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
- }
- h1 { 
-   font-size: 2rem;
-   font-weight: 700;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   -webkit-background-clip: text;
-   -webkit-text-fill-color: transparent;
-   background-clip: text;
- }
- .header-controls { display: flex; gap: 1rem; }
- .back-btn { 
-   padding: 0.75rem 1.5rem;
-   background: rgba(255, 255, 255, 0.1);
-   color: #fff;
-   border: 1px solid rgba(255, 255, 255, 0.2);
-   border-radius: 8px;
-   cursor: pointer;
-   text-decoration: none;
-   display: inline-block;
-   font-weight: 600;
-   transition: all 0.3s ease;
- }
- .back-btn:hover { 
-   background: rgba(255, 255, 255, 0.15);
-   transform: translateY(-2px);
- }
- .clear-btn { 
-   padding: 0.75rem 1.5rem;
-   background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%);
-   color: #fff;
-   border: none;
-   border-radius: 8px;
-   cursor: pointer;
-   font-weight: 600;
-   transition: all 0.3s ease;
- }
- .clear-btn:hover { 
-   transform: translateY(-2px);
-   box-shadow: 0 4px 12px rgba(239, 68, 68, 0.4);
- }
- .history-item { 
-   background: rgba(255, 255, 255, 0.05);
-   backdrop-filter: blur(10px);
-   border: 1px solid rgba(255, 255, 255, 0.1);
-   padding: 1.5rem;
-   margin: 1rem 0;
-   border-radius: 16px;
-   box-shadow: 0 4px 16px rgba(0, 0, 0, 0.2);
- }
- .history-header { 
-   display: flex;
-   justify-content: space-between;
-   align-items: center;
-   margin-bottom: 1rem;
-   padding-bottom: 1rem;
-   border-bottom: 1px solid rgba(255, 255, 255, 0.1);
- }
- .timestamp { 
-   font-size: 0.9rem;
-   color: #b0b0b0;
-   font-weight: 500;
- }
- .request-text { 
-   font-weight: 600;
-   font-size: 1.1rem;
-   margin: 0.5rem 0;
-   color: #fff;
- }
- .media-type { 
-   display: inline-block;
-   padding: 0.4rem 0.8rem;
-   background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-   border-radius: 8px;
-   font-size: 0.8rem;
-   font-weight: 700;
-   text-transform: uppercase;
-   letter-spacing: 0.5px;
- }
- .recs-summary { margin-top: 1rem; }
- .recs-summary > strong { 
-   display: block;
-   margin-bottom: 0.75rem;
-   color: #b0b0b0;
-   font-size: 0.95rem;
- }
- .rec { 
-   background: rgba(255, 255, 255, 0.03);
-   border: 1px solid rgba(255, 255, 255, 0.08);
-   padding: 1.25rem;
-   margin: 0.75rem 0;
-   border-radius: 12px;
-   display: flex;
-   align-items: center;
-   gap: 1rem;
-   transition: all 0.3s ease;
- }
- .rec:hover {
-   background: rgba(255, 255, 255, 0.05);
-   border-color: rgba(102, 126, 234, 0.3);
-   transform: translateX(4px);
- }
- .rec-meta { display: flex; flex-direction: column; gap: 0.25rem; flex: 1; }
- .title { font-size: 1.15rem; font-weight: 700; color: #fff; }
- .type { 
-   font-size: 0.8rem;
-   color: #667eea;
-   font-weight: 600;
-   text-transform: uppercase;
-   letter-spacing: 0.5px;
- }
- .reason { font-size: 0.9rem; color: #b0b0b0; margin-top: 0.25rem; line-height: 1.4; }
- .add-btn {
-   padding: 0.6rem 1rem;
-   background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-   color: white;
-   border: none;
-   border-radius: 8px;
-   cursor: pointer;
-   font-size: 0.85rem;
-   font-weight: 600;
-   transition: all 0.3s ease;
-   white-space: nowrap;
- }
- .add-btn:hover {
-   transform: translateY(-1px);
-   box-shadow: 0 4px 12px rgba(16, 185, 129, 0.4);
- }
- .add-btn:disabled { 
-   opacity: 0.5;
-   cursor: not-allowed;
-   transform: none;
- }
- .imdb-button {
-   background: #f5c518;
-   color: #000;
-   border: none;
-   padding: 0.6rem 1rem;
-   border-radius: 8px;
-   text-decoration: none;
-   font-size: 0.85rem;
-   font-weight: 700;
-   transition: all 0.3s ease;
-   white-space: nowrap;
- }
- .imdb-button:hover { 
-   background: #f6d860;
-   transform: translateY(-1px);
-   box-shadow: 0 4px 12px rgba(245, 197, 24, 0.4);
- }
- .add-controls { display: flex; gap: 0.75rem; align-items: center; flex-wrap: wrap; }
- .status {
-   margin-left: 0.5rem;
-   font-weight: 600;
-   min-width: 160px;
-   font-size: 0.85rem;
- }
- .rating-badge {
-   display: inline-flex;
-   align-items: center;
-   background: #f5c518;
-   color: #000;
-   padding: 0.25rem 0.5rem;
-   border-radius: 6px;
-   font-size: 0.8rem;
-   font-weight: 700;
-   white-space: nowrap;
-   gap: 0.25rem;
- }
- .rating-badge::before {
-   content: "⭐";
- }
- .no-history { 
-   text-align: center;
-   padding: 4rem 2rem;
-   color: #888;
-   background: rgba(255, 255, 255, 0.03);
-   border-radius: 16px;
-   margin: 2rem 0;
- }
- .no-history p { font-size: 1.1rem; }
-</style>
-</head>
-<body>
-  <div class="container">
-    <div class="header">
-      <h1>Search History</h1>
-      <div class="header-controls">
-        <a href="{{ url_for('index') }}" class="back-btn">← Back to Search</a>
-        {% if history %}
-          <form method="POST" action="{{ url_for('clear_history') }}" style="display: inline;">
-            <button type="submit" class="clear-btn" onclick="return confirm('Clear all history?')">Clear History</button>
-          </form>
-        {% endif %}
-      </div>
-    </div>
-
-  {% if not history %}
-    <div class="no-history">
-      <p>No search history yet. Make your first search to see it here!</p>
-    </div>
-  {% else %}
-    {% for item in history %}
-      <div class="history-item">
-        <div class="history-header">
-          <span class="timestamp">{{ item.timestamp }}</span>
-          <span class="media-type">{{ item.media_type|upper }}</span>
-        </div>
-        <div class="request-text">{{ item.request }}</div>
-        <div class="recs-summary">
-          <strong>{{ item.recommendations|length }} Recommendation(s):</strong>
-          {% for rec in item.recommendations %}
-            <div class="rec"
-                 data-title="{{ rec.title }}"
-                 data-year="{{ rec.year or '' }}"
-                 data-type="{{ rec.type }}">
-              
-              <div class="rec-meta">
-                <div style="display: flex; align-items: center; gap: 0.5rem; flex-wrap: wrap;">
-                  <div class="type">{{ rec.type|upper }}{% if rec.year %} · {{ rec.year }}{% endif %}</div>
-                  {% if rec.rating %}
-                    <span class="rating-badge">{{ "%.1f"|format(rec.rating) }}</span>
-                  {% endif %}
-                </div>
-                <div class="title">{{ rec.title }}</div>
-                <div class="reason">{{ rec.reason }}</div>
-              </div>
-
-              <div class="add-controls">
-                <button type="button" class="add-btn" data-mode="download">
-                  Add &amp; Download to {{ 'Sonarr' if rec.type=='tv' else 'Radarr' }}
-                </button>
-
-                <button type="button" class="add-btn" data-mode="library">
-                  Add to Library (no download)
-                </button>
-
-                <span class="status" aria-live="polite"></span>
-              </div>
-
-              {% if rec.imdb_id %}
-                <a href="https://www.imdb.com/title/{{ rec.imdb_id }}/" target="_blank" class="imdb-button">IMDb</a>
-              {% else %}
-                <a href="https://www.imdb.com/find?q={{ rec.title }}{% if rec.year %} {{ rec.year }}{% endif %}&s=tt" target="_blank" class="imdb-button">IMDb</a>
-              {% endif %}
-            </div>
-          {% endfor %}
-        </div>
-      </div>
-    {% endfor %}
-  {% endif %}
-
-<script>
-document.addEventListener('DOMContentLoaded', () => {
-  function setStatusForItem(itemEl, text, color) {
-    const status = itemEl.querySelector('.status');
-    if (status) {
-      status.textContent = text;
-      status.style.color = color || '';
-    }
-  }
-
-  async function addItem(buttonEl) {
-    if (buttonEl.disabled) return;
+@app.route("/add_bulk", methods=["POST"])
+def add_bulk():
+    """Add several titles at once and trigger a single Radarr search for the new movies.
+    
+    Sonarr's SeriesSearch command only takes one series, so series keep
+    searching from their own addOptions.
+    """
+    data = request.get_json(silent=True) or {}
+    items = [i for i in data.get("items") or [] if isinstance(i, dict)]
+    if not items:
+        return jsonify({"status": "error", "message": "No items to add"}), 400
 
-    const item = buttonEl.closest('.rec');
-    if (!item) {
-      console.error('Cannot find parent .rec element for button', buttonEl);
-      return;
-    }
+    movie_ids: List[int] = []
 
-    const title = item.dataset.title || '';
-    const year = item.dataset.year || '';
-    const type = item.dataset.type || 'movie';
-    const mode = buttonEl.dataset.mode || 'download';
+    def add_item(item: Dict[str, Any]) -> bool:
+        title = item.get("title") or ""
+        if not title:
+            return False
+        mode = item.get("mode") or "download"
+        ok, _ = _do_add(title, item.get("year"), item.get("type"), mode, search_ids=movie_ids)
+        return ok
+
+    # Lookups and adds run concurrently on the shared pool; results keep request order
+    futures = [_executor.submit(add_item, item) for item in items]
+    results = []
+    for item, future in zip(items, futures):
+        try:
+            ok = future.result(timeout=120)
+        except Exception as e:
+            logger.error("[add_bulk] Error adding %r: %s", item.get("title"), e)
+            ok = False
+        results.append({"title": item.get("title"), "ok": ok})
 
-    if (!title) {
-      setStatusForItem(item, 'Missing title', '#f88');
-      return;
-    }
+    if movie_ids:
+        try:
+            radarr_post("/command", {"name": "MoviesSearch", "movieIds": movie_ids})
+        except Exception as e:
+            logger.error("[add_bulk] MoviesSearch error: %s", e)
 
-    const buttons = Array.from(item.querySelectorAll('.add-btn'));
-    buttons.forEach(b => b.disabled = true);
-    setStatusForItem(item, 'Working...', '#ffd');
-
-    try {
-      const resp = await fetch("{{ url_for('add_ajax') }}", {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ title, year, type, mode })
-      });
-
-      let data = {};
-      try { data = await resp.json(); } catch(e){ /* ignore */ }
-
-      if (resp.ok) {
-        setStatusForItem(item, data.message || 'Added', '#8f8');
-        item.style.opacity = '0.6';
-      } else {
-        const msg = data && data.message ? data.message : (`Server error: ${resp.status}`);
-        setStatusForItem(item, msg, '#f88');
-      }
-    } catch (err) {
-      console.error('Network error calling add_ajax', err);
-      setStatusForItem(item, 'Network error', '#f88');
-    } finally {
-      buttons.forEach(b => b.disabled = false);
-    }
-  }
+    added = sum(r["ok"] for r in results)
+    status = "ok" if added == len(results) else "error"
+    return jsonify({
+        "status": status,
+        "message": f"Added {added} of {len(results)} titles",
+        "results": results,
+    }), (200 if added else 500)
 
-  document.body.addEventListener('click', (ev) => {
-    const btn = ev.target.closest && ev.target.closest('.add-btn');
-    if (!btn) return;
-    ev.preventDefault();
-    addItem(btn);
-  });
-});
-</script>
 
-  </div>
-</body>
-</html>
-"""
+@functools.lru_cache(maxsize=1)
+def _empty_history_page() -> str:
+    """Render the no-history page once; it only changes with the static file versions."""
+    return render_template("history.html", history=[])
 
 
 @app.route("/history")
 def history_page():
-    return render_template_string(HISTORY_TEMPLATE, history=history)
+    # Render a snapshot; iterating the live deque while a search appends would raise
+    with _history_lock:
+        entries = list(history)
+        version = _history_version
+
+    # The page only changes with the history, so a revalidation can skip the render
+    etag = f"history-{version}"
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    elif not entries:
+        response = app.make_response(_empty_history_page())
+    else:
+        response = app.make_response(render_template("history.html", history=entries))
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route("/history/clear", methods=["POST"])
 def clear_history():
     """Clear search history."""
+    global _history_version
     with _history_lock:
         history.clear()
+        _history_version += 1
     flash("History cleared successfully.", "success")
     return redirect(url_for("history_page"))
 
@@ -1746,12 +1774,35 @@ def clear_history():
 def clear_cache():
     """Clear library cache to force fresh data fetch."""
     with _cache_lock:
-        _library_cache["sonarr"] = {"data": None, "timestamp": 0}
-        _library_cache["radarr"] = {"data": None, "timestamp": 0}
+        _listing_cache.clear()
+        _lookup_cache.clear()
+        _recommendation_cache.clear()
+        _tmdb_cache.clear()
+        _owned_titles.update(series=None, movies=None, timestamp=float("-inf"))
+        _etag_cache.clear()
     flash("Cache cleared successfully.", "success")
     return redirect(url_for("index"))
 
 
-if __name__ == "__main__":
+# ---------- STARTUP ----------
+def _warm_caches() -> None:
+    """Load the library listings and everything derived from them."""
+    try:
+        series, movies, complete = load_libraries()
+        lib_summary = build_library_summary(series, movies)
+        _library_prompt(lib_summary)
+        get_owned_title_sets(series, movies, complete)
+        logger.info("[Startup] Caches warmed: %d series, %d movies", len(series), len(movies))
+    except Exception as e:
+        logger.warning("[Startup] Cache warm-up failed: %s", e)
+
 
+if WARM_CACHES_ON_START:
+    # Each gunicorn worker imports the app, so each warms its own caches. This runs on
+    # its own thread: load_libraries waits on _executor, so it must not occupy a worker
+    Thread(target=_warm_caches, name="warm-caches", daemon=True).start()
+
+
+if __name__ == "__main__":
+    # Local development only; the container serves the app with gunicorn (see gunicorn.conf.py)
     app.run(host="0.0.0.0", port=5050)
@@ -0,0 +1,15 @@
+"""Gunicorn settings for the container; each value can be overridden from the environment."""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5050")
+
+# One worker: history and caches live in process memory, so extra workers would
+# each keep their own copy. Threads give concurrency while requests wait on
+# Sonarr/Radarr/OpenAI.
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Recommendations wait on a streamed completion plus lookups
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = 5
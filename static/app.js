@@ -0,0 +1,151 @@
+// Endpoint URLs are rendered by Flask onto the script tag
+const ADD_URL = document.currentScript.dataset.addUrl;
+const ADD_BULK_URL = document.currentScript.dataset.addBulkUrl;
+
+document.addEventListener('DOMContentLoaded', () => {
+  // Submit form on Enter key in textareas (Shift+Enter for new line)
+  const textareas = document.querySelectorAll('textarea');
+  textareas.forEach(textarea => {
+    textarea.addEventListener('keydown', (e) => {
+      if (e.key === 'Enter' && !e.shiftKey) {
+        e.preventDefault();
+        e.target.form.submit();
+      }
+    });
+  });
+
+  // Helper to log to console and the UI status
+  function setStatusForItem(itemEl, text, color) {
+    const status = itemEl.querySelector('.status');
+    if (status) {
+      status.textContent = text;
+      status.style.color = color || '';
+    }
+  }
+
+  async function addItem(buttonEl) {
+    // prevent double clicks
+    if (buttonEl.disabled) return;
+
+    const item = buttonEl.closest('.rec');
+    if (!item) {
+      console.error('Cannot find parent .rec element for button', buttonEl);
+      return;
+    }
+
+    // title/year/type are pre-serialized by the template
+    const payload = { ...JSON.parse(item.dataset.payload || '{}'), mode: buttonEl.dataset.mode || 'download' };
+
+    if (!payload.title) {
+      setStatusForItem(item, 'Missing title', '#f88');
+      return;
+    }
+
+    // UI: disable all add buttons for this item while request runs
+    const buttons = Array.from(item.querySelectorAll('.add-btn'));
+    buttons.forEach(b => b.disabled = true);
+    setStatusForItem(item, 'Working...', '#ffd');
+
+    try {
+      const resp = await fetch(ADD_URL, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload)
+      });
+
+      let data = {};
+      try { data = await resp.json(); } catch(e){ /* ignore */ }
+
+      if (resp.ok) {
+        setStatusForItem(item, data.message || 'Added', '#8f8');
+        // Optionally fade the item or hide it so user can't add twice:
+        item.style.opacity = '0.6';
+      } else {
+        // server returned an error status
+        const msg = data && data.message ? data.message : (`Server error: ${resp.status}`);
+        setStatusForItem(item, msg, '#f88');
+      }
+    } catch (err) {
+      console.error('Network error calling add_ajax', err);
+      setStatusForItem(item, 'Network error', '#f88');
+    } finally {
+      // re-enable buttons so user can retry
+      buttons.forEach(b => b.disabled = false);
+    }
+  }
+
+  // Add every recommendation in one request; the server runs a single search for new movies
+  async function addAll(buttonEl) {
+    if (buttonEl.disabled) return;
+
+    const items = Array.from(document.querySelectorAll('#recs .rec'));
+    if (!items.length) return;
+    const mode = buttonEl.dataset.mode || 'download';
+    const payload = items.map(item => ({ ...JSON.parse(item.dataset.payload || '{}'), mode }));
+
+    buttonEl.disabled = true;
+    items.forEach(item => setStatusForItem(item, 'Working...', '#ffd'));
+
+    try {
+      const resp = await fetch(ADD_BULK_URL, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ items: payload })
+      });
+
+      let data = {};
+      try { data = await resp.json(); } catch(e){ /* ignore */ }
+
+      // results are returned in the same order as the items sent
+      const results = data.results || [];
+      items.forEach((item, i) => {
+        const result = results[i];
+        if (result && result.ok) {
+          setStatusForItem(item, 'Added', '#8f8');
+          item.style.opacity = '0.6';
+        } else {
+          const msg = result ? 'Failed. Check server logs.' : (data.message || `Server error: ${resp.status}`);
+          setStatusForItem(item, msg, '#f88');
+        }
+      });
+    } catch (err) {
+      console.error('Network error calling add_bulk', err);
+      items.forEach(item => setStatusForItem(item, 'Network error', '#f88'));
+    } finally {
+      buttonEl.disabled = false;
+    }
+  }
+
+  // Hovering an add button looks the title up server-side, so the click usually
+  // finds the Sonarr/Radarr lookup already cached. Once per item; failures are ignored.
+  document.body.addEventListener('mouseover', (ev) => {
+    const btn = ev.target.closest && ev.target.closest('.add-btn');
+    if (!btn) return;
+    const item = btn.closest('.rec');
+    if (!item || item.dataset.prefetched) return;
+    item.dataset.prefetched = '1';
+
+    const payload = { ...JSON.parse(item.dataset.payload || '{}'), mode: 'validate' };
+    if (!payload.title) return;
+    fetch(ADD_URL, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload)
+    }).catch(() => { /* ignore */ });
+  });
+
+  // Attach click listeners to buttons via event delegation (handles dynamically-added items)
+  document.body.addEventListener('click', (ev) => {
+    const allBtn = ev.target.closest && ev.target.closest('.add-all-btn');
+    if (allBtn) {
+      ev.preventDefault();
+      addAll(allBtn);
+      return;
+    }
+    const btn = ev.target.closest && ev.target.closest('.add-btn');
+    if (!btn) return;
+    // stop default and handle via AJAX
+    ev.preventDefault();
+    addItem(btn);
+  });
+});